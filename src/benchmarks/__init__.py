@@ -0,0 +1,13 @@
+import os
+from pathlib import Path
+
+
+def use_database_url(url: str) -> None:
+    # must run before anything from src is imported, the config is read on import
+    os.environ["ENV_STATE"] = "test"
+    os.environ["TEST_DATABASE_URL"] = url
+    os.environ["TEST_DB_FORCE_ROLL_BACK"] = "false"
+
+
+def use_database(path: Path) -> None:
+    use_database_url(f"sqlite:///{path}")
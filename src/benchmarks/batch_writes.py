@@ -0,0 +1,89 @@
+"""
+Rows per second written through the single-item endpoints (POST /post, /comment,
+/like) versus the batch endpoints, on a fresh SQLite database file.
+
+    python -m src.benchmarks.batch_writes --rows 2000 --batch-size 500
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from src.benchmarks import use_database
+
+
+async def rows_per_second(client, path: str, items: list[dict], batch_size: int):
+    start = time.perf_counter()
+    if batch_size == 1:
+        for item in items:
+            response = await client.post(path, json=item)
+            assert response.status_code == 201, response.text
+    else:
+        for i in range(0, len(items), batch_size):
+            response = await client.post(
+                f"{path}/batch", json=items[i : i + batch_size]
+            )
+            assert response.status_code == 200, response.text
+    return len(items) / (time.perf_counter() - start)
+
+
+async def run(rows: int, batch_size: int) -> dict:
+    from httpx import ASGITransport, AsyncClient
+
+    from src.database import database
+    from src.main import app
+    from src.migrations import migrate
+
+    migrate()
+    await database.connect()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        user = {"email": "bench@example.net", "password": "1234"}
+        await client.post("/register", json=user)
+        token = (await client.post("/token", json=user)).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        report = {}
+        for size in (1, batch_size):
+            # every run likes its own posts, a repeated like writes nothing
+            first_post = rows * len(report) + 1
+            posts = [{"body": f"Post {i}"} for i in range(rows)]
+            post_ids = range(first_post, first_post + rows)
+            report[f"batch_size_{size}"] = {
+                "posts": await rows_per_second(client, "/post", posts, size),
+                "comments": await rows_per_second(
+                    client,
+                    "/comment",
+                    [{"body": "Comment", "post_id": i} for i in post_ids],
+                    size,
+                ),
+                "likes": await rows_per_second(
+                    client, "/like", [{"post_id": i} for i in post_ids], size
+                ),
+            }
+    await database.disconnect()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_database(Path(directory) / "benchmark.db")
+        report = asyncio.run(run(args.rows, args.batch_size))
+
+    rates = {
+        name: {kind: round(value) for kind, value in results.items()}
+        for name, results in report.items()
+    }
+    print(json.dumps({"rows": args.rows, "rows_per_second": rates}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+CPU time spent turning the handlers' queries into SQL, per request: building the
+SQLAlchemy expression and compiling it on every call (as before the compiled
+statement cache) versus binding the values to a CachedStatement. Both go
+through _compile of the configured `databases` backend, so for PostgreSQL:
+
+    python -m src.benchmarks.compiled_statements --iterations 2000
+    TEST_DATABASE_URL=postgresql+asyncpg://localhost/media python -m src.benchmarks.compiled_statements
+"""
+
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("ENV_STATE", "test")
+from src.database import (  # noqa: E402
+    comment_table,
+    database,
+    like_table,
+    post_table,
+    user_table,
+)
+from src.routers import post, user  # noqa: E402
+from src.security import select_user  # noqa: E402
+
+
+def rebuilt_queries() -> dict:
+    # the expressions the handlers built for every call before the cache
+    def increment(counter):
+        column = post_table.c[counter]
+        return (
+            post_table.update().where(post_table.c.id == 1).values({column: column + 1})
+        )
+
+    return {
+        "select_user": lambda: user_table.select().where(
+            user_table.c.email == "bench@example.net"
+        ),
+        "insert_user": lambda: user_table.insert().values(
+            email="bench@example.net", password="x"
+        ),
+        "select_post": lambda: post_table.select().where(post_table.c.id == 1),
+        "insert_post": lambda: post_table.insert().values(body="Post", user_id=1),
+        "feed_page": lambda: post.paginate_posts(
+            post.select_post_and_likes,
+            post.PostSorting.most_likes,
+            {"id": 50, "likes": 3},
+        ).limit(21),
+        "insert_comment": lambda: comment_table.insert().values(
+            body="Comment", post_id=1, user_id=1
+        ),
+        "select_comments": lambda: comment_table.select().where(
+            comment_table.c.post_id == 1
+        ),
+        "select_post_with_comments": lambda: (
+            post.select_post_and_likes.add_columns(
+                comment_table.c.id.label("comment_id"),
+                comment_table.c.body.label("comment_body"),
+                comment_table.c.user_id.label("comment_user_id"),
+            )
+            .select_from(
+                post_table.outerjoin(
+                    comment_table, comment_table.c.post_id == post_table.c.id
+                )
+            )
+            .where(post_table.c.id == 1)
+            .order_by(comment_table.c.id)
+        ),
+        "insert_like": lambda: post.insert_likes([1], 1),
+        "delete_like": lambda: (
+            like_table.delete()
+            .where(like_table.c.post_id == 1, like_table.c.user_id == 1)
+            .returning(like_table.c.id)
+        ),
+        "increment_counter": lambda: increment("like_count"),
+    }
+
+
+def cached_queries() -> dict:
+    return {
+        "select_user": lambda: select_user(email="bench@example.net"),
+        "insert_user": lambda: user.insert_user(
+            email="bench@example.net", password="x"
+        ),
+        "select_post": lambda: post.select_post(post_id=1),
+        "insert_post": lambda: post.insert_post(body="Post", user_id=1),
+        "feed_page": lambda: post.select_feed_page(post.PostSorting.most_likes, True)(
+            limit=21, cursor_id=50, cursor_likes=3
+        ),
+        "insert_comment": lambda: post.insert_comment(
+            body="Comment", post_id=1, user_id=1
+        ),
+        "select_comments": lambda: post.select_comments(post_id=1),
+        "select_post_with_comments": lambda: post.select_post_with_comments(False)(
+            post_id=1, comment_limit=None
+        ),
+        "insert_like": lambda: post.insert_like(post_id=1, user_id=1),
+        "delete_like": lambda: post.delete_like(post_id=1, user_id=1),
+        "increment_counter": lambda: post.increment_counter("like_count", 1, 1),
+    }
+
+
+# the queries each request runs, with the user and token caches warm
+REQUESTS = {
+    "POST /register": ["select_user", "insert_user"],
+    "POST /token": ["select_user"],
+    "GET /post": ["feed_page"],
+    "GET /post/{id}": ["select_post_with_comments"],
+    "GET /post/{id}/comment": ["select_comments"],
+    "POST /post": ["insert_post"],
+    "POST /comment": ["select_post", "insert_comment", "increment_counter"],
+    "POST /like": ["insert_like", "increment_counter"],
+    "DELETE /like/{id}": ["delete_like", "increment_counter"],
+}
+
+
+def cpu_microseconds(connection, build, iterations: int) -> float:
+    connection._compile(build())  # the cached statement compiles on first use
+    start = time.process_time()
+    for _ in range(iterations):
+        connection._compile(build())
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    # compiling needs no connection to the database
+    connection = database._backend.connection()
+    queries = {
+        kind: {
+            query: cpu_microseconds(connection, build, args.iterations)
+            for query, build in builders.items()
+        }
+        for kind, builders in (
+            ("rebuilt", rebuilt_queries()),
+            ("cached", cached_queries()),
+        )
+    }
+    report = {
+        request: {
+            kind: round(sum(queries[kind][query] for query in names), 1)
+            for kind in ("rebuilt", "cached")
+        }
+        for request, names in REQUESTS.items()
+    }
+    for request in report.values():
+        request["saved"] = round(request["rebuilt"] - request["cached"], 1)
+
+    print(
+        json.dumps(
+            {"dialect": database.url.dialect, "cpu_us_per_request": report}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
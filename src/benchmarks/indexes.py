@@ -0,0 +1,117 @@
+"""
+Times the index-sensitive read queries on a database with the first release's
+schema, migrates it and times them again.
+
+    python -m src.benchmarks.indexes --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy
+
+os.environ.setdefault("ENV_STATE", "test")
+from src.migrations import INITIAL_SCHEMA, migrate  # noqa: E402
+
+# query -> which of (post_id, user_id) it is parametrized with
+QUERIES = {
+    "comments_on_post": (
+        "SELECT * FROM comments WHERE post_id = ? ORDER BY id",
+        ("post_id",),
+    ),
+    "likes_of_post": ("SELECT count(*) FROM likes WHERE post_id = ?", ("post_id",)),
+    "like_by_user": (
+        "SELECT id FROM likes WHERE post_id = ? AND user_id = ?",
+        ("post_id", "user_id"),
+    ),
+    "posts_of_user": ("SELECT * FROM posts WHERE user_id = ?", ("user_id",)),
+}
+
+
+def seed(path: Path, rows: int) -> None:
+    users = max(rows // 100, 1)
+    posts = max(rows // 10, 1)
+    connection = sqlite3.connect(path)
+    with connection:
+        for statement in INITIAL_SCHEMA:
+            connection.execute(statement)
+        connection.executemany(
+            "INSERT INTO users (id, email, password) VALUES (?, ?, '')",
+            ((i, f"user{i}@example.net") for i in range(1, users + 1)),
+        )
+        connection.executemany(
+            "INSERT INTO posts (id, body, user_id) VALUES (?, 'Post', ?)",
+            ((i, random.randint(1, users)) for i in range(1, posts + 1)),
+        )
+        for table in ("comments", "likes"):
+            connection.executemany(
+                f"INSERT INTO {table} (body, post_id, user_id) VALUES ('Body', ?, ?)",
+                (
+                    (random.randint(1, posts), random.randint(1, users))
+                    for _ in range(rows)
+                ),
+            )
+    connection.close()
+
+
+def time_queries(path: Path, rows: int, repeat: int) -> dict[str, float]:
+    users = max(rows // 100, 1)
+    posts = max(rows // 10, 1)
+    connection = sqlite3.connect(path)
+    results = {}
+    for name, (query, columns) in QUERIES.items():
+        upper = {"post_id": posts, "user_id": users}
+        params = [
+            tuple(random.randint(1, upper[column]) for column in columns)
+            for _ in range(repeat)
+        ]
+        start = time.perf_counter()
+        for values in params:
+            connection.execute(query, values).fetchall()
+        results[name] = (time.perf_counter() - start) / repeat * 1000
+    connection.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "benchmark.db"
+        seed(path, args.rows)
+        before = time_queries(path, args.rows, args.repeat)
+
+        engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+        start = time.perf_counter()
+        migrate(engine)
+        migration_seconds = time.perf_counter() - start
+        engine.dispose()
+
+        after = time_queries(path, args.rows, args.repeat)
+
+    report = {
+        "rows": args.rows,
+        "migration_seconds": round(migration_seconds, 2),
+        "queries_ms": {
+            name: {
+                "before": round(before[name], 3),
+                "after": round(after[name], 3),
+                "speedup": round(before[name] / after[name], 1),
+            }
+            for name in QUERIES
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Load test of the API on a seeded database (see src.benchmarks.seed): each
+scenario runs --requests requests (login: --login-requests) from --concurrency
+concurrent clients through the app in-process, and reports throughput and
+p50/p95/p99 latency as JSON.
+
+- feed: the first pages of GET /post in a random sorting, following X-Next-Cursor
+- detail: GET /post/{id} of random posts
+- login: POST /token as random users, bcrypt bound
+- like_storm: POST /like from many users on the ten most liked posts
+- comment_write: POST /comment on random posts
+
+    python -m src.benchmarks.load_test --requests 2000 --concurrency 32 --output report.json
+    python -m src.benchmarks.load_test --baseline report.json --tolerance 0.2
+
+With --baseline the run exits with status 1 when a scenario's p95 latency rose
+or its throughput fell by more than --tolerance.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from src.benchmarks import use_database
+from src.benchmarks.seed import SEED_PASSWORD, Volumes, seed, seed_email
+
+FEED_PAGES = 3
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99, "max": 1.0}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    # nearest rank
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Scenario:
+    def __init__(self, client, volumes: Volumes, tokens: list[str]) -> None:
+        self.client = client
+        self.volumes = volumes
+        self.tokens = tokens
+
+    def auth(self, rng: random.Random) -> dict:
+        return {"Authorization": f"Bearer {rng.choice(self.tokens)}"}
+
+    async def feed(self, rng: random.Random, timed) -> None:
+        params = {"sorting": rng.choice(["new", "old", "most_likes"])}
+        for _ in range(FEED_PAGES):
+            response = await timed(self.client.get("/post", params=params))
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params["cursor"] = response.headers["X-Next-Cursor"]
+
+    async def detail(self, rng: random.Random, timed) -> None:
+        await timed(self.client.get(f"/post/{rng.randint(1, self.volumes.posts)}"))
+
+    async def login(self, rng: random.Random, timed) -> None:
+        user = {
+            "email": seed_email(rng.randint(1, self.volumes.users)),
+            "password": SEED_PASSWORD,
+        }
+        await timed(self.client.post("/token", json=user))
+
+    async def like_storm(self, rng: random.Random, timed) -> None:
+        post_id = rng.randint(1, min(10, self.volumes.posts))
+        await timed(
+            self.client.post("/like", json={"post_id": post_id}, headers=self.auth(rng))
+        )
+
+    async def comment_write(self, rng: random.Random, timed) -> None:
+        comment = {"body": "Load test", "post_id": rng.randint(1, self.volumes.posts)}
+        await timed(self.client.post("/comment", json=comment, headers=self.auth(rng)))
+
+
+SCENARIOS = ["feed", "detail", "login", "like_storm", "comment_write"]
+
+
+async def run_scenario(
+    scenario, requests: int, concurrency: int, seed_value: int
+) -> dict:
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    issued = itertools.count()
+
+    async def timed(request):
+        start = time.perf_counter()
+        response = await request
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] += 1
+        return response
+
+    async def client(number: int) -> None:
+        rng = random.Random(seed_value * 1000 + number)
+        while next(issued) < requests:
+            await scenario(rng, timed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 1),
+        "latency_ms": {
+            name: round(percentile(latencies, fraction) * 1000, 2)
+            for name, fraction in PERCENTILES.items()
+        },
+    }
+
+
+async def run(args, volumes: Volumes) -> dict:
+    from httpx import ASGITransport, AsyncClient
+
+    from src.database import database, engine
+    from src.main import app
+    from src.migrations import migrate
+    from src.security import create_access_token
+
+    migrate()
+    start = time.perf_counter()
+    seed(engine, volumes, random.Random(args.seed))
+    seed_seconds = time.perf_counter() - start
+
+    # the clients' tokens are signed directly, only the login scenario pays bcrypt
+    tokens = [
+        create_access_token(seed_email(user_id))
+        for user_id in range(1, min(volumes.users, 500) + 1)
+    ]
+    await database.connect()
+    # an exception in the app is a 500 counted in the errors, not the end of the run
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            scenario = Scenario(client, volumes, tokens)
+            results = {
+                name: await run_scenario(
+                    getattr(scenario, name),
+                    args.login_requests if name == "login" else args.requests,
+                    args.concurrency,
+                    args.seed,
+                )
+                for name in args.scenarios
+            }
+    finally:
+        # an open aiosqlite connection's thread would keep the process alive
+        await database.disconnect()
+    return {
+        "dialect": database.url.dialect,
+        "volumes": volumes.__dict__,
+        "seed": args.seed,
+        "seed_seconds": round(seed_seconds, 2),
+        "concurrency": args.concurrency,
+        "scenarios": results,
+    }
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    for name, result in report["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        p95, p95_before = result["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        if p95 > p95_before * (1 + tolerance):
+            found.append(f"{name}: p95 {p95_before}ms -> {p95}ms")
+        rps, rps_before = result["throughput_rps"], before["throughput_rps"]
+        if rps < rps_before * (1 - tolerance):
+            found.append(f"{name}: throughput {rps_before}/s -> {rps}/s")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    Volumes.add_arguments(parser)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=1000)
+    # each login hashes with bcrypt, a few per second per core
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", type=Path, help="also write the report here")
+    parser.add_argument("--baseline", type=Path, help="report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    volumes = Volumes.from_arguments(args)
+    with tempfile.TemporaryDirectory() as directory:
+        use_database(Path(directory) / "load_test.db")
+        report = asyncio.run(run(args, volumes))
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output + "\n")
+
+    if args.baseline:
+        found = regressions(
+            report, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in found:
+            print(f"regression: {regression}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
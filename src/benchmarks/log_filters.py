@@ -0,0 +1,83 @@
+"""
+Log records per second through the configured filter chain (correlation id and
+email obfuscation), compared with the email filter as it was before the
+memoization - splitting and rebuilding the address on each of the three
+handlers it was attached to.
+
+    python -m src.benchmarks.log_filters --records 200000 --users 100
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault("ENV_STATE", "test")
+from src.configs.logging_config import log_filters  # noqa: E402
+
+HANDLERS = 3
+
+
+def rebuilt(email: str, obfuscated_length: int) -> str:
+    # obfuscated() before the memoization
+    characters = email[:obfuscated_length]
+    first, last = email.split("@")
+    return characters + ("*" * (len(first) - obfuscated_length)) + "@" + last
+
+
+class RebuildingFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if "email" in record.__dict__:
+            record.email = rebuilt(record.email, 0)
+        return True
+
+
+def records_per_second(
+    filter_chains: list[list[logging.Filter]], emails: list[str], records: int
+) -> float:
+    start = time.perf_counter()
+    for i in range(records):
+        record = logging.makeLogRecord(
+            {"msg": "Fetching user from the database", "email": emails[i % len(emails)]}
+        )
+        for filters in filter_chains:
+            for log_filter in filters:
+                log_filter.filter(record)
+    return records / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    emails = [f"user{i}@example.net" for i in range(args.users)]
+    correlation_id, email_obfuscation = log_filters()
+    # each handler had its own instances of both filters
+    before = [[correlation_id, RebuildingFilter()] for _ in range(HANDLERS)]
+    after = [[correlation_id, email_obfuscation]]
+
+    report = {
+        "records": args.records,
+        "users": args.users,
+        "records_per_second": {
+            "rebuilt_per_handler": round(
+                records_per_second(before, emails, args.records)
+            ),
+            "memoized_once": round(records_per_second(after, emails, args.records)),
+            "memoized_per_handler": round(
+                records_per_second(
+                    [[correlation_id, email_obfuscation]] * HANDLERS,
+                    emails,
+                    args.records,
+                )
+            ),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
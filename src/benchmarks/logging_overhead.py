@@ -0,0 +1,112 @@
+"""
+Time per request with the src loggers at CRITICAL, INFO and DEBUG, through the
+app in-process, with a handler that formats every record like the console one.
+A level's overhead is its time minus that of CRITICAL, where no record is
+created at all.
+
+Each iteration likes a post, reads it, unlikes it and reads it again, so every
+read misses the response cache and queries the database.
+
+    python -m src.benchmarks.logging_overhead --requests 200 --rounds 5
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from src.benchmarks import use_database
+from src.benchmarks.seed import Volumes, seed, seed_email
+
+LEVELS = ("CRITICAL", "INFO", "DEBUG")
+
+
+class FormattingHandler(logging.Handler):
+    # formats every record like the console handler, so the cost of emitting counts
+    def __init__(self) -> None:
+        super().__init__()
+        self.setFormatter(logging.Formatter("%(name)s:%(lineno)d - %(message)s"))
+        self.stream = io.StringIO()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.stream.write(self.format(record))
+
+
+async def seconds_per_request(client, headers: dict, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await client.post("/like", json={"post_id": 1}, headers=headers)
+        await client.get("/post/1")
+        await client.delete("/like/1", headers=headers)
+        await client.get("/post/1")
+    return (time.perf_counter() - start) / (4 * requests)
+
+
+async def run(args) -> dict[str, float]:
+    from httpx import ASGITransport, AsyncClient
+
+    from src.database import database, engine
+    from src.main import app
+    from src.migrations import migrate
+    from src.security import create_access_token
+
+    migrate()
+    seed(engine, Volumes(users=1, posts=1, comments=0, likes=0), random.Random(0))
+    headers = {"Authorization": f"Bearer {create_access_token(seed_email(1))}"}
+
+    logger = logging.getLogger("src")
+    logger.propagate = False
+    timings: dict[str, float] = {}
+    await database.connect()
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            # warm up the statement and response caches
+            await seconds_per_request(client, headers, args.requests)
+            # the levels take turns and the best round counts, which evens out noise
+            for _ in range(args.rounds):
+                for level in LEVELS:
+                    handler = FormattingHandler()
+                    logger.addHandler(handler)
+                    logger.setLevel(level)
+                    try:
+                        elapsed = await seconds_per_request(
+                            client, headers, args.requests
+                        )
+                    finally:
+                        logger.removeHandler(handler)
+                    timings[level] = min(elapsed, timings.get(level, elapsed))
+    finally:
+        await database.disconnect()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_database(Path(directory) / "benchmark.db")
+        timings = asyncio.run(run(args))
+
+    report = {
+        "us_per_request": {
+            level: round(seconds * 1_000_000, 1) for level, seconds in timings.items()
+        },
+        "overhead_us": {
+            level: round((timings[level] - timings["CRITICAL"]) * 1_000_000, 1)
+            for level in ("INFO", "DEBUG")
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Feed latency while logins are hashing passwords, through the app in-process:
+the median and worst GET /post before and during a storm of concurrent logins,
+with bcrypt in the hash pool and, for comparison, called on the event loop.
+During a storm a feed request arrives every 10ms and is timed from its arrival.
+
+    python -m src.benchmarks.login_storm --logins 8 --rounds 3
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from src.benchmarks import use_database
+from src.benchmarks.seed import SEED_PASSWORD, Volumes, seed, seed_email
+
+ARRIVAL_SECONDS = 0.01
+
+
+async def feed_seconds(client) -> float:
+    start = time.perf_counter()
+    response = await client.get("/post")
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def storm(client, logins: int) -> list[float]:
+    credentials = {"email": seed_email(1), "password": SEED_PASSWORD}
+    tasks = [
+        asyncio.create_task(client.post("/token", json=credentials))
+        for _ in range(logins)
+    ]
+    # a feed request is due every ARRIVAL_SECONDS and timed from when it was
+    # due, so time spent waiting for a blocked event loop counts too
+    latencies = []
+    start = time.perf_counter()
+    while not all(task.done() for task in tasks):
+        due = start + len(latencies) * ARRIVAL_SECONDS
+        await asyncio.sleep(max(due - time.perf_counter(), 0))
+        await feed_seconds(client)
+        latencies.append(time.perf_counter() - due)
+    for response in await asyncio.gather(*tasks):
+        response.raise_for_status()
+    return latencies
+
+
+def summary(latencies: list[float]) -> dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "median_ms": round(statistics.median(latencies) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+async def run(args) -> dict:
+    from httpx import ASGITransport, AsyncClient
+
+    from src import security
+    from src.database import database, engine
+    from src.main import app
+    from src.migrations import migrate
+
+    migrate()
+    seed(engine, Volumes(users=1, posts=20, comments=0, likes=0), random.Random(0))
+
+    async def on_the_loop(plain_password: str, hashed_password: str) -> bool:
+        return security.verify_password(plain_password, hashed_password)
+
+    pooled = security.verify_password_async
+    report = {}
+    await database.connect()
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            # warm up the statement and response caches
+            for _ in range(100):
+                await feed_seconds(client)
+            report["baseline"] = summary(
+                [await feed_seconds(client) for _ in range(100)]
+            )
+            for name, verify in (("pool", pooled), ("event_loop", on_the_loop)):
+                security.verify_password_async = verify
+                latencies = []
+                for _ in range(args.rounds):
+                    latencies += await storm(client, args.logins)
+                report[name] = summary(latencies)
+    finally:
+        security.verify_password_async = pooled
+        await database.disconnect()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_database(Path(directory) / "benchmark.db")
+        report = asyncio.run(run(args))
+
+    print(json.dumps({"logins": args.logins, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
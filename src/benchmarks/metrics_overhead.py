@@ -0,0 +1,74 @@
+"""
+What the metrics cost: microseconds of CPU the middleware adds to a request and
+the query wrapper adds to a query, each measured around a no-op so nothing
+else is in the numbers.
+
+    python -m src.benchmarks.metrics_overhead --iterations 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("ENV_STATE", "test")
+from src.metrics import MetricsMiddleware, timed_query  # noqa: E402
+
+
+class Route:
+    path = "/post/{post_id}"
+
+
+async def app(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def query(*args):
+    return None
+
+
+async def send(message):
+    pass
+
+
+async def microseconds(call, iterations: int, *args) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        await call(*args)
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+async def run(iterations: int) -> dict:
+    middleware = MetricsMiddleware(app)
+    timed = timed_query("fetch_one", query)
+
+    def request(asgi_app):
+        return lambda: asgi_app(
+            {"type": "http", "method": "GET", "path": "/post/1"}, None, send
+        )
+
+    bare_request = await microseconds(request(app), iterations)
+    measured_request = await microseconds(request(middleware), iterations)
+    bare_query = await microseconds(query, iterations, "SELECT 1")
+    timed_query_us = await microseconds(timed, iterations, "SELECT 1")
+    return {
+        "iterations": iterations,
+        "overhead_us": {
+            "per_request": round(measured_request - bare_request, 2),
+            "per_query": round(timed_query_us - bare_query, 2),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.iterations)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Times the /search query against a `LIKE '%term%'` scan on a database of
+generated posts, for a common, a rare, a prefix and a two word search.
+
+    python -m src.benchmarks.search --rows 1000000
+
+The posts are written with the first release's schema and indexed by the
+migration, then single posts are inserted to time the index trigger. Post
+bodies are words from a generated vocabulary with a Zipf distribution, so the
+common word is in most posts and the rare one in a few. Both queries
+return the first page: the search ranked, the scan in id order - a scan for a
+common word stops at the first page's rows, for a rare one it reads the table.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import time
+from itertools import accumulate
+from pathlib import Path
+
+import sqlalchemy
+
+os.environ.setdefault("ENV_STATE", "test")
+from src.database import post_table  # noqa: E402
+from src.migrations import INITIAL_SCHEMA, migrate  # noqa: E402
+from src.routers.search import SearchKind, match_query, select_search_page  # noqa: E402
+
+VOCABULARY_SIZE = 50_000
+WORDS_PER_POST = 12
+PAGE_SIZE = 20
+
+
+def vocabulary(rng: random.Random) -> list[str]:
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        length = rng.randint(4, 9)
+        words.add("".join(rng.choices(string.ascii_lowercase, k=length)))
+    return sorted(words, key=lambda _: rng.random())
+
+
+def seed(path: Path, rows: int, words: list[str], rng: random.Random) -> None:
+    # the n-th word is 1/n as frequent as the first
+    weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    connection = sqlite3.connect(path)
+    with connection:
+        for statement in INITIAL_SCHEMA:
+            connection.execute(statement)
+        connection.execute("INSERT INTO users (id, email, password) VALUES (1, '', '')")
+        connection.executemany(
+            "INSERT INTO posts (id, body, user_id) VALUES (?, ?, 1)",
+            (
+                (i, " ".join(rng.choices(words, cum_weights=weights, k=WORDS_PER_POST)))
+                for i in range(1, rows + 1)
+            ),
+        )
+    connection.close()
+
+
+def time_inserts(path: Path, words: list[str], repeat: int) -> float:
+    # a post per transaction as the API writes them, indexed by the trigger
+    connection = sqlite3.connect(path)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with connection:
+            connection.execute(
+                "INSERT INTO posts (body, user_id) VALUES (?, 1)",
+                (" ".join(words[:WORDS_PER_POST]),),
+            )
+    connection.close()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def time_query(connection, query, params: dict, repeat: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        found = connection.execute(query, params).all()
+    return (time.perf_counter() - start) / repeat * 1000, len(found)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = vocabulary(rng)
+    searches = {
+        "common": words[0],
+        "rare": words[VOCABULARY_SIZE // 2],
+        "prefix": f"{words[100][:3]}*",
+        "two_words": f"{words[10]} {words[200]}",
+    }
+    search = select_search_page(SearchKind.posts, "sqlite").query
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "benchmark.db"
+        seed(path, args.rows, words, rng)
+
+        # builds the index of the existing posts
+        engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+        start = time.perf_counter()
+        migrate(engine)
+        migration_seconds = time.perf_counter() - start
+
+        results = {}
+        with engine.connect() as connection:
+            for name, q in searches.items():
+                # the closest a LIKE gets: every word somewhere in the body
+                scan = sqlalchemy.select(post_table.c.id).where(
+                    *(
+                        post_table.c.body.like(f"%{word.rstrip('*')}%")
+                        for word in q.split()
+                    )
+                )
+                scan = scan.order_by(post_table.c.id).limit(PAGE_SIZE)
+                fts_ms, fts_rows = time_query(
+                    connection,
+                    search,
+                    {
+                        "match": match_query(q, "sqlite"),
+                        "limit": PAGE_SIZE,
+                        "offset": 0,
+                    },
+                    args.repeat,
+                )
+                like_ms, like_rows = time_query(connection, scan, {}, args.repeat)
+                results[name] = {
+                    "q": q,
+                    "fts_ms": round(fts_ms, 3),
+                    "like_ms": round(like_ms, 3),
+                    "speedup": round(like_ms / fts_ms, 2),
+                    "rows": {"fts": fts_rows, "like": like_rows},
+                }
+        engine.dispose()
+        insert_ms = time_inserts(path, words, args.repeat)
+
+    report = {
+        "rows": args.rows,
+        "migration_seconds": round(migration_seconds, 2),
+        "insert_ms_per_post": round(insert_ms, 3),
+        "queries_ms": results,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Fills an empty database with generated users, posts, comments and likes, with
+the posts' like and comment counters matching. The same --seed gives the same
+data. Every user's password is SEED_PASSWORD.
+
+    python -m src.benchmarks.seed --database-url sqlite:///seed.db --users 1000 --posts 10000
+
+The database is always named, never taken from the configuration - an
+ENV_STATE from .env could otherwise point it at the tests' database. It is
+migrated first and has to be empty. src.benchmarks.load_test seeds a fresh
+database of its own.
+"""
+
+import argparse
+import json
+import random
+import time
+from dataclasses import dataclass
+
+import sqlalchemy
+
+from src.benchmarks import use_database_url
+
+SEED_PASSWORD = "password"
+CHUNK_SIZE = 5000
+
+
+@dataclass
+class Volumes:
+    users: int = 1000
+    posts: int = 10_000
+    comments: int = 50_000
+    likes: int = 50_000
+
+    @classmethod
+    def add_arguments(cls, parser: argparse.ArgumentParser) -> None:
+        for name, default in cls().__dict__.items():
+            parser.add_argument(f"--{name}", type=int, default=default)
+
+    @classmethod
+    def from_arguments(cls, args: argparse.Namespace) -> "Volumes":
+        return cls(**{name: getattr(args, name) for name in cls().__dict__})
+
+
+def seed_email(user_id: int) -> str:
+    return f"user{user_id}@example.net"
+
+
+def insert_chunked(connection, table: sqlalchemy.Table, rows) -> None:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            connection.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(table.insert(), chunk)
+
+
+def seed(engine: sqlalchemy.Engine, volumes: Volumes, rng: random.Random) -> None:
+    from src.database import comment_table, like_table, post_table, user_table
+    from src.security import get_password_hash
+
+    with engine.begin() as connection:
+        for table in (user_table, post_table, comment_table, like_table):
+            count = connection.execute(
+                sqlalchemy.select(sqlalchemy.func.count()).select_from(table)
+            ).scalar()
+            if count:
+                raise SystemExit(f"{table.name} is not empty, seed a fresh database")
+
+    # ids of a fresh table start at 1, so rows can refer to each other by them
+    comments = [
+        (rng.randint(1, volumes.posts), rng.randint(1, volumes.users))
+        for _ in range(volumes.comments)
+    ]
+    # a user likes a post once, half the likes go to a few popular posts
+    likes = set()
+    limit = min(volumes.likes, volumes.posts * volumes.users // 2)
+    while len(likes) < limit:
+        if rng.random() < 0.5:
+            post_id = min(int(rng.paretovariate(1.2)), volumes.posts)
+        else:
+            post_id = rng.randint(1, volumes.posts)
+        likes.add((post_id, rng.randint(1, volumes.users)))
+    comment_counts = [0] * (volumes.posts + 1)
+    like_counts = [0] * (volumes.posts + 1)
+    for post_id, _ in comments:
+        comment_counts[post_id] += 1
+    for post_id, _ in likes:
+        like_counts[post_id] += 1
+
+    password = get_password_hash(SEED_PASSWORD)  # one bcrypt hash for everybody
+    with engine.begin() as connection:
+        insert_chunked(
+            connection,
+            user_table,
+            (
+                {"email": seed_email(i), "password": password}
+                for i in range(1, volumes.users + 1)
+            ),
+        )
+        insert_chunked(
+            connection,
+            post_table,
+            (
+                {
+                    "body": f"Post {i}",
+                    "user_id": rng.randint(1, volumes.users),
+                    "like_count": like_counts[i],
+                    "comment_count": comment_counts[i],
+                }
+                for i in range(1, volumes.posts + 1)
+            ),
+        )
+        insert_chunked(
+            connection,
+            comment_table,
+            (
+                {"body": "Comment", "post_id": post_id, "user_id": user_id}
+                for post_id, user_id in comments
+            ),
+        )
+        insert_chunked(
+            connection,
+            like_table,
+            (
+                {"post_id": post_id, "user_id": user_id}
+                for post_id, user_id in sorted(likes)
+            ),
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    Volumes.add_arguments(parser)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", required=True, help="e.g. sqlite:///seed.db")
+    args = parser.parse_args()
+
+    use_database_url(args.database_url)
+    from src.database import engine
+    from src.migrations import migrate
+
+    volumes = Volumes.from_arguments(args)
+    migrate()
+    start = time.perf_counter()
+    seed(engine, volumes, random.Random(args.seed))
+    report = {**volumes.__dict__, "seconds": round(time.perf_counter() - start, 2)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
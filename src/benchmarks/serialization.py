@@ -0,0 +1,103 @@
+"""
+Rows per second turned into a JSON feed page, on a seeded SQLite database:
+
+- response_model: what FastAPI does for a response_model - validate the rows
+  from their attributes, dump them to Python and encode with json.dumps
+- validated: the response cache's default serializer, the same validation
+  dumped straight to JSON by pydantic
+- rows: serialize_rows, the rows mapped to dicts and encoded by orjson
+
+    python -m src.benchmarks.serialization --page-size 100 --include-comments 5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from src.benchmarks import use_database
+from src.benchmarks.seed import Volumes, seed
+
+
+def serializers() -> dict:
+    from src.response_cache import serialize, serialize_rows, type_adapter
+
+    def response_model(response_type, content) -> bytes:
+        adapter = type_adapter(response_type)
+        python = adapter.dump_python(adapter.validate_python(content), mode="json")
+        return json.dumps(python).encode()
+
+    return {
+        "response_model": response_model,
+        "validated": serialize,
+        "rows": serialize_rows,
+    }
+
+
+def rows_per_second(serializer, response_type, content, rows: int, seconds: float):
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        serializer(response_type, content)
+        done += rows
+    return done / (time.perf_counter() - start)
+
+
+async def run(args) -> dict:
+    from src.database import database, engine
+    from src.migrations import migrate
+    from src.routers.post import Feed, PostSorting, load_posts
+
+    migrate()
+    posts = args.page_size * 2
+    volumes = Volumes(users=100, posts=posts, comments=posts * 10, likes=posts * 10)
+    seed(engine, volumes, random.Random(0))
+
+    await database.connect()
+    pages = {
+        "posts": await load_posts(PostSorting.new, args.page_size, None, None),
+        "posts_with_comments": await load_posts(
+            PostSorting.new, args.page_size, None, args.include_comments
+        ),
+    }
+    await database.disconnect()
+
+    report = {}
+    for name, (content, _) in pages.items():
+        report[name] = {
+            serializer_name: round(
+                rows_per_second(serializer, Feed, content, args.page_size, args.seconds)
+            )
+            for serializer_name, serializer in serializers().items()
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--include-comments", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_database(Path(directory) / "benchmark.db")
+        report = asyncio.run(run(args))
+
+    print(
+        json.dumps(
+            {
+                "page_size": args.page_size,
+                "include_comments": args.include_comments,
+                "rows_per_second": report,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Concurrent read/write throughput of the default SQLite backend (the stock
+`databases` one with BEGIN IMMEDIATE transactions) versus the production
+profile (WAL, pragmas, one writer and a pool of readers, see
+src/sqlite_pool.py), on a fresh SQLite database file.
+
+Readers page through the feed, writers add a comment and bump the post's
+counter in one transaction, all at the same time for --seconds.
+
+    python -m src.benchmarks.sqlite_profile --readers 16 --writers 4 --seconds 5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy
+
+from src.benchmarks import use_database
+
+
+async def workload(database, readers: int, writers: int, seconds: float, posts: int):
+    from src.database import comment_table, increment_counter, post_table
+
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    deadline = time.perf_counter() + seconds
+
+    async def read():
+        while time.perf_counter() < deadline:
+            query = (
+                post_table.select()
+                .where(post_table.c.id < random.randint(21, posts))
+                .order_by(post_table.c.id.desc())
+                .limit(20)
+            )
+            await database.fetch_all(query)
+            counts["reads"] += 1
+
+    async def write():
+        while time.perf_counter() < deadline:
+            post_id = random.randint(1, posts)
+            try:
+                async with database.transaction():
+                    await database.execute(
+                        comment_table.insert().values(
+                            body="Comment", post_id=post_id, user_id=1
+                        )
+                    )
+                    await database.execute(
+                        increment_counter("comment_count", post_id, 1)
+                    )
+                counts["writes"] += 1
+            except sqlite3.OperationalError:
+                # "database is locked" once the busy timeout runs out
+                counts["errors"] += 1
+
+    await asyncio.gather(
+        *(read() for _ in range(readers)), *(write() for _ in range(writers))
+    )
+    return {name: round(value / seconds) for name, value in counts.items()}
+
+
+async def run(url: str, readers: int, writers: int, seconds: float, posts: int):
+    from src.sqlite_pool import (
+        PooledSQLiteDatabase,
+        SQLiteDatabase,
+        production_pragmas,
+    )
+
+    profiles = {
+        "default": SQLiteDatabase(url),
+        "production": PooledSQLiteDatabase(
+            url,
+            readers=4,
+            pragmas=production_pragmas(
+                mmap_size=256 * 1024 * 1024, cache_size=-64 * 1024, busy_timeout=5000
+            ),
+        ),
+    }
+    report = {}
+    for name, database in profiles.items():
+        await database.connect()
+        report[name] = await workload(database, readers, writers, seconds, posts)
+        await database.disconnect()
+    return report
+
+
+def seed(url: str, posts: int) -> None:
+    from src.database import post_table, user_table
+    from src.migrations import migrate
+
+    engine = sqlalchemy.create_engine(url)
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            user_table.insert().values(id=1, email="bench@example.net", password="x")
+        )
+        connection.execute(
+            post_table.insert(),
+            [{"body": f"Post {i}", "user_id": 1} for i in range(posts)],
+        )
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--posts", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "benchmark.db"
+        use_database(path)
+        url = f"sqlite:///{path}"
+        seed(url, args.posts)
+        report = asyncio.run(
+            run(url, args.readers, args.writers, args.seconds, args.posts)
+        )
+
+    print(
+        json.dumps(
+            {
+                "readers": args.readers,
+                "writers": args.writers,
+                "per_second": report,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Tokens per second through get_subject_for_token_type with and without the
+verified-token cache, for a client that reuses the same access token.
+
+    python -m src.benchmarks.token_cache --requests 100000
+"""
+
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("ENV_STATE", "test")
+from src import security  # noqa: E402
+from src.cache import TTLCache  # noqa: E402
+
+
+def tokens_per_second(tokens: list[str], requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        security.get_subject_for_token_type(tokens[i % len(tokens)], type="access")
+    return requests / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=100)
+    args = parser.parse_args()
+
+    tokens = [
+        security.create_access_token(f"user{i}@example.net")
+        for i in range(args.clients)
+    ]
+    cache = security.token_cache
+
+    security.token_cache = TTLCache(maxsize=0, ttl=0, clock=time.time)
+    uncached = tokens_per_second(tokens, args.requests)
+    security.token_cache = cache
+    cached = tokens_per_second(tokens, args.requests)
+
+    report = {
+        "requests": args.requests,
+        "clients": args.clients,
+        "tokens_per_second": {"uncached": round(uncached), "cached": round(cached)},
+        "speedup": round(cached / uncached, 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
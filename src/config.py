@@ -1,6 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -19,6 +19,50 @@ class GlobalConfig(BaseConfig):
     )
     LOGTAIL_API_KEY: Optional[str] = None
     INGESTING_HOST: Optional[str] = None
+    # authenticated users kept in memory by get_current_user, 0 disables the cache
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: float = 60
+    # verified JWTs kept in memory until they expire, 0 disables the cache
+    TOKEN_CACHE_SIZE: int = 4096
+    # serialized GET /post* responses, invalidated by the write handlers
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIZE: int = 1024
+    RESPONSE_CACHE_TTL_SECONDS: float = 300
+    # tag versions kept in memory, least recently used ones are evicted
+    RESPONSE_CACHE_MAX_VERSIONS: int = 8192
+    # POST /like answers 202 and likes are written in batches, see src/like_buffer.py
+    LIKE_BUFFER_ENABLED: bool = False
+    LIKE_BUFFER_MAX_SIZE: int = 1000
+    LIKE_BUFFER_FLUSH_SECONDS: float = 0.5
+    # past this many pending likes, e.g. while flushes fail, POST /like gets a 503
+    LIKE_BUFFER_MAX_PENDING: int = 10_000
+    # read-only GET handlers are spread over these, see src/replicas.py
+    DATABASE_REPLICA_URLS: list[str] = []
+    # a client reads from the primary for this long after its last write
+    REPLICA_READ_YOUR_WRITES_SECONDS: int = 5
+    # asyncpg connection pool, used when DATABASE_URL is postgresql+asyncpg://
+    DB_POOL_MIN_SIZE: int = 5
+    DB_POOL_MAX_SIZE: int = 20
+    # prepared statements kept per connection, 0 when running behind pgbouncer
+    DB_STATEMENT_CACHE_SIZE: int = 1024
+    # production SQLite profile: WAL and pragmas on every connection, one writer
+    # connection and a pool of readers, see src/sqlite_pool.py
+    SQLITE_TUNED: bool = False
+    SQLITE_READERS: int = 4
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # bcrypt runs in this many threads, past the queue limit requests get a 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    # log records wait in a bounded queue for the listener thread that writes them,
+    # when it is full they are dropped, or with "block" the request waits
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_QUEUE_FULL_POLICY: Literal["drop", "block"] = "drop"
+    # per-request query profile in the X-Query-Profile header and a log line,
+    # query shapes run this many times in one request are flagged as N+1
+    QUERY_PROFILER_ENABLED: bool = False
+    QUERY_PROFILER_REPEAT_THRESHOLD: int = 2
 
 
 class DevConfig(GlobalConfig):
@@ -27,6 +71,7 @@ class DevConfig(GlobalConfig):
 
 class ProdConfig(GlobalConfig):
     model_config = SettingsConfigDict(env_prefix="PROD_")
+    SQLITE_TUNED: bool = True
 
 
 class TestConfig(GlobalConfig):
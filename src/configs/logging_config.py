@@ -1,14 +1,36 @@
+import copy
 import logging
+import queue
+from functools import lru_cache
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+
+from asgi_correlation_id import CorrelationIdFilter
 
 from src.config import DevConfig, config
 
+logger = logging.getLogger(__name__)
+
+
+# distinct addresses remembered by obfuscated(), most logs repeat a few users
+EMAIL_CACHE_SIZE = 1024
+
 
-def obfuscated(email: str, obfuscated_length: int) -> str:
+class ObfuscatedEmail(str):
+    """An already obfuscated address, filters pass it on as it is."""
+
+
+@lru_cache(maxsize=EMAIL_CACHE_SIZE)
+def obfuscated(email: str, obfuscated_length: int) -> ObfuscatedEmail:
     # michal.goss@example.net mi*********@example.net
-    characters = email[:obfuscated_length]
-    first, last = email.split("@")
-    return characters + ("*" * (len(first) - obfuscated_length)) + "@" + last
+    # without an @ the whole value is treated as the name and masked
+    first, at, last = email.rpartition("@")
+    if not at:
+        first, last = email, ""
+    characters = first[:obfuscated_length]
+    return ObfuscatedEmail(
+        characters + ("*" * (len(first) - len(characters))) + at + last
+    )
 
 
 class EmailObfuscationFilter(logging.Filter):
@@ -17,11 +39,120 @@ class EmailObfuscationFilter(logging.Filter):
         self.obfuscated_length = obfuscated_length
 
     def filter(self, record: logging.LogRecord) -> bool:
-        if "email" in record.__dict__:
-            record.email = obfuscated(record.email, self.obfuscated_length)
+        email = record.__dict__.get("email")
+        # a record goes through one filter per handler, obfuscate it only once
+        if isinstance(email, str) and not isinstance(email, ObfuscatedEmail):
+            record.email = obfuscated(email, self.obfuscated_length)
         return True
 
 
+class QueueSinkHandler(QueueHandler):
+    """
+    Puts records on the log queue, the listener thread passes them on to `sinks`
+    - the handlers the logger had - so their I/O stays off the event loop.
+    With block=False a full queue drops the record instead of stalling a request.
+    """
+
+    def __init__(
+        self, log_queue: queue.Queue, sinks: list[logging.Handler], block: bool
+    ) -> None:
+        super().__init__(log_queue)
+        self.sinks = sinks
+        self.block = block
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the record never leaves the process, so unlike the base class this keeps
+        # exc_info for the sinks to render; the message is merged now because
+        # the arguments may change before the listener gets to it
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            # the sinks travel beside the record, as an attribute the json
+            # formatter would write them out
+            self.queue.put((self.sinks, record), block=self.block)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SinkListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # waits for room, the base class would raise on a full queue
+        self.queue.put(self._sentinel)
+
+    def handle(self, item: tuple[list[logging.Handler], logging.LogRecord]) -> None:
+        sinks, record = item
+        for sink in sinks:
+            if record.levelno >= sink.level:
+                sink.handle(record)
+
+
+log_listener: SinkListener | None = None
+queue_handlers: dict[str, QueueSinkHandler] = {}
+
+
+def start_log_queue(
+    logger_names: list[str],
+    filters: list[logging.Filter],
+    maxsize: int,
+    block: bool,
+) -> None:
+    """Moves the handlers of the loggers behind one bounded queue and listener."""
+    global log_listener
+    stop_log_queue()
+
+    log_queue = queue.Queue(maxsize=maxsize)
+    for name in logger_names:
+        named_logger = logging.getLogger(name)
+        handler = QueueSinkHandler(log_queue, list(named_logger.handlers), block)
+        # filters read the request's context, which the listener thread can't see
+        for log_filter in filters:
+            handler.addFilter(log_filter)
+        named_logger.handlers = [handler]
+        queue_handlers[name] = handler
+
+    log_listener = SinkListener(log_queue)
+    log_listener.start()
+
+
+def stop_log_queue() -> None:
+    """
+    Writes out the queued records and hands the sinks back to their loggers,
+    so whatever is logged after shutdown is still written, synchronously.
+    """
+    global log_listener
+    if log_listener is None:
+        return
+    log_listener.stop()
+    log_listener = None
+
+    for name, handler in queue_handlers.items():
+        for sink in handler.sinks:
+            for log_filter in handler.filters:
+                sink.addFilter(log_filter)
+        logging.getLogger(name).handlers = handler.sinks
+    dropped = sum(handler.dropped for handler in queue_handlers.values())
+    queue_handlers.clear()
+    if dropped:
+        logger.warning("Dropped %d log records, the log queue was full", dropped)
+
+
+def log_filters() -> list[logging.Filter]:
+    return [
+        CorrelationIdFilter(
+            uuid_length=8 if isinstance(config, DevConfig) else 32,
+            default_value="-",
+        ),
+        EmailObfuscationFilter(
+            obfuscated_length=2 if isinstance(config, DevConfig) else 0
+        ),
+    ]
+
+
 handlers = ["default", "rotating_file"]
 if isinstance(config, DevConfig):
     handlers = ["default", "rotating_file", "logtail"]
@@ -32,17 +163,6 @@ def configure_logging() -> None:
         {
             "version": 1,
             "disable_existing_loggers": False,
-            "filters": {
-                "correlation_id": {
-                    "()": "asgi_correlation_id.CorrelationIdFilter",
-                    "uuid_length": 8 if isinstance(config, DevConfig) else 32,
-                    "default_value": "-",
-                },
-                "email_obfuscation": {
-                    "()": EmailObfuscationFilter,
-                    "obfuscated_length": 2 if isinstance(config, DevConfig) else 0,
-                },
-            },
             "formatters": {
                 "console": {
                     "class": "logging.Formatter",
@@ -60,7 +180,6 @@ def configure_logging() -> None:
                     "class": "rich.logging.RichHandler",
                     "level": "DEBUG",
                     "formatter": "console",
-                    "filters": ["correlation_id", "email_obfuscation"],
                 },
                 "rotating_file": {
                     "class": "logging.handlers.RotatingFileHandler",
@@ -70,13 +189,11 @@ def configure_logging() -> None:
                     "maxBytes": 1024 * 1024,  # 1MB
                     "backupCount": 2,
                     "encoding": "utf8",
-                    "filters": ["correlation_id", "email_obfuscation"],
                 },
                 "logtail": {
                     "class": "logtail.LogtailHandler",
                     "level": "DEBUG",
                     "formatter": "console",
-                    "filters": ["correlation_id", "email_obfuscation"],
                     "source_token": config.LOGTAIL_API_KEY,
                     "host": config.INGESTING_HOST,
                 },
@@ -93,3 +210,9 @@ def configure_logging() -> None:
             },
         }
     )
+    start_log_queue(
+        ["uvicorn", "src", "databases", "aiosqlite"],
+        filters=log_filters(),
+        maxsize=config.LOG_QUEUE_SIZE,
+        block=config.LOG_QUEUE_FULL_POLICY == "block",
+    )
@@ -1,7 +1,11 @@
 import databases
 import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
 
 from src.config import config
+from src.metrics import instrument_queries
+from src.sqlite_pool import PooledSQLiteDatabase, SQLiteDatabase, production_pragmas
+from src.statements import CachedStatement
 
 metadata = sqlalchemy.MetaData()
 
@@ -10,7 +14,17 @@ post_table = sqlalchemy.Table(
     metadata,
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("body", sqlalchemy.String),
-    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    sqlalchemy.Column(
+        "user_id", sqlalchemy.ForeignKey("users.id"), nullable=False, index=True
+    ),
+    # denormalized counters, kept in step with likes/comments by the write handlers
+    sqlalchemy.Column(
+        "like_count", sqlalchemy.Integer, nullable=False, server_default="0"
+    ),
+    sqlalchemy.Column(
+        "comment_count", sqlalchemy.Integer, nullable=False, server_default="0"
+    ),
+    sqlalchemy.Index("ix_posts_like_count_id", "like_count", "id"),
 )
 
 user_table = sqlalchemy.Table(
@@ -28,6 +42,8 @@ comment_table = sqlalchemy.Table(
     sqlalchemy.Column("body", sqlalchemy.String),
     sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), nullable=False),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    # comments of a post are read in id order
+    sqlalchemy.Index("ix_comments_post_id_id", "post_id", "id"),
 )
 
 like_table = sqlalchemy.Table(
@@ -36,14 +52,105 @@ like_table = sqlalchemy.Table(
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("body", sqlalchemy.String),
     sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), nullable=False),
-    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    sqlalchemy.Column(
+        "user_id", sqlalchemy.ForeignKey("users.id"), nullable=False, index=True
+    ),
+    # a user can like a post once, also serves lookups by post_id
+    sqlalchemy.Index("ux_likes_post_id_user_id", "post_id", "user_id", unique=True),
 )
 
-engine = sqlalchemy.create_engine(
-    config.DATABASE_URL, connect_args={"check_same_thread": False}
+# applied migrations, see src/migrations.py
+schema_version_table = sqlalchemy.Table(
+    "schema_version",
+    metadata,
+    sqlalchemy.Column("version", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("description", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column(
+        "applied_at",
+        sqlalchemy.DateTime,
+        nullable=False,
+        server_default=sqlalchemy.func.current_timestamp(),
+    ),
 )
-metadata.create_all(engine)
 
-database = databases.Database(
-    config.DATABASE_URL, force_rollback=config.DB_FORCE_ROLL_BACK
-)
+database_url = sqlalchemy.make_url(config.DATABASE_URL)
+
+# the schema is created and upgraded by src.migrations.migrate, not at import time
+if database_url.get_backend_name() == "postgresql":
+    # migrations and scripts are synchronous, asyncpg only has an async API
+    engine = sqlalchemy.create_engine(database_url.set(drivername="postgresql+psycopg"))
+else:
+    engine = sqlalchemy.create_engine(
+        database_url, connect_args={"check_same_thread": False}
+    )
+
+
+def create_database(url: str, force_rollback: bool = False) -> databases.Database:
+    if sqlalchemy.make_url(url).get_backend_name() == "postgresql":
+        created = databases.Database(
+            url,
+            force_rollback=force_rollback,
+            min_size=config.DB_POOL_MIN_SIZE,
+            max_size=config.DB_POOL_MAX_SIZE,
+            statement_cache_size=config.DB_STATEMENT_CACHE_SIZE,
+        )
+    elif config.SQLITE_TUNED:
+        created = PooledSQLiteDatabase(
+            url,
+            force_rollback=force_rollback,
+            readers=config.SQLITE_READERS,
+            pragmas=production_pragmas(
+                mmap_size=config.SQLITE_MMAP_SIZE,
+                cache_size=config.SQLITE_CACHE_SIZE,
+                busy_timeout=config.SQLITE_BUSY_TIMEOUT_MS,
+            ),
+        )
+    else:
+        created = SQLiteDatabase(url, force_rollback=force_rollback)
+    return instrument_queries(created)
+
+
+# the primary, all writes go here
+database = create_database(config.DATABASE_URL, config.DB_FORCE_ROLL_BACK)
+
+
+def upsert(table: sqlalchemy.Table):
+    # INSERT that supports the backend's ON CONFLICT clause
+    if database.url.dialect == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+counter_increments = {
+    counter: CachedStatement(
+        post_table.update()
+        .where(post_table.c.id == sqlalchemy.bindparam("post_id"))
+        .values({column: column + sqlalchemy.bindparam("by")})
+    )
+    for counter, column in (
+        ("like_count", post_table.c.like_count),
+        ("comment_count", post_table.c.comment_count),
+    )
+}
+
+
+def increment_counter(counter: str, post_id: int, by: int):
+    return counter_increments[counter](post_id=post_id, by=by)
+
+
+def increment_counters(counter: str, counts: dict[int, int]):
+    # a different increment per post in one statement, the cast lets postgres
+    # type the CASE parameters
+    column = post_table.c[counter]
+    increment = sqlalchemy.case(
+        {
+            post_id: sqlalchemy.cast(count, sqlalchemy.Integer)
+            for post_id, count in counts.items()
+        },
+        value=post_table.c.id,
+    )
+    return (
+        post_table.update()
+        .where(post_table.c.id.in_(counts))
+        .values({column: column + increment})
+    )
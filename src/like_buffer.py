@@ -0,0 +1,183 @@
+"""
+Write buffer for likes.
+
+With LIKE_BUFFER_ENABLED, POST /like only records the (post_id, user_id) pair
+in memory and answers 202. Pending likes are written in one transaction when
+LIKE_BUFFER_MAX_SIZE pairs are waiting or every LIKE_BUFFER_FLUSH_SECONDS, and
+once more on shutdown. Repeated likes are coalesced before they reach the
+database, likes of posts that don't exist are dropped when flushed. A like
+that is still pending is undone by DELETE /like in memory, and in the database
+too in case an earlier flush wrote it.
+
+A failed flush keeps its likes for the next one, so while the database is down
+the buffer only grows - past LIKE_BUFFER_MAX_PENDING likes new ones are
+rejected with a 503 instead.
+"""
+
+import asyncio
+import logging
+from collections import Counter, defaultdict
+
+import sqlalchemy
+from fastapi import HTTPException, status
+
+from src import metrics
+from src.config import config
+from src.database import (
+    database,
+    increment_counters,
+    like_table,
+    post_table,
+    upsert,
+    user_table,
+)
+from src.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+def insert_post_likes(post_id: int, user_ids: list[int]):
+    # likes of one post by many users, nothing is inserted for a missing post
+    pairs = sqlalchemy.select(post_table.c.id, user_table.c.id).where(
+        post_table.c.id == post_id, user_table.c.id.in_(user_ids)
+    )
+    return (
+        upsert(like_table)
+        .from_select(["post_id", "user_id"], pairs)
+        .on_conflict_do_nothing(index_elements=["post_id", "user_id"])
+        .returning(like_table.c.post_id)
+    )
+
+
+class LikeBuffer:
+    def __init__(
+        self,
+        max_size: int,
+        flush_interval: float,
+        max_pending: int = 10_000,
+        enabled: bool = True,
+    ):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enabled = enabled
+        # used as an ordered set, a second like of the same pair is a no-op
+        self.pending: dict[tuple[int, int], None] = {}
+        self.flushed = 0
+        self.rejected = 0
+        self._flush_lock = asyncio.Lock()
+        # created in start(), so it belongs to the loop that runs the app
+        self._full: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def add(self, post_id: int, user_id: int) -> None:
+        if (post_id, user_id) not in self.pending and (
+            len(self.pending) >= self.max_pending
+        ):
+            self.rejected += 1
+            logger.warning("Like buffer is full, rejecting like")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending[(post_id, user_id)] = None
+        if self._full and len(self.pending) >= self.max_size:
+            self._full.set()
+
+    async def discard(self, post_id: int, user_id: int) -> bool:
+        # waits out a running flush, after it the like is either written or
+        # back in pending
+        async with self._flush_lock:
+            if (post_id, user_id) not in self.pending:
+                return False
+            del self.pending[(post_id, user_id)]
+            return True
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self.pending:
+                return 0
+            batch, self.pending = self.pending, {}
+            if self._full:
+                self._full.clear()
+
+            users_by_post = defaultdict(list)
+            for post_id, user_id in batch:
+                users_by_post[post_id].append(user_id)
+
+            try:
+                inserted = Counter()
+                async with database.transaction():
+                    for post_id, user_ids in users_by_post.items():
+                        query = insert_post_likes(post_id, user_ids)
+                        for row in await database.fetch_all(query):
+                            inserted[row.post_id] += 1
+                    if inserted:
+                        await database.execute(
+                            increment_counters("like_count", inserted)
+                        )
+            except Exception:
+                logger.exception("Flushing %d likes failed, will retry", len(batch))
+                # likes added meanwhile stay, the failed batch goes back in front
+                self.pending = {**batch, **self.pending}
+                raise
+
+            written = sum(inserted.values())
+            self.flushed += written
+            logger.info("Flushed %d buffered likes, %d new", len(batch), written)
+            if inserted:
+                await response_cache.invalidate(
+                    *(f"post:{post_id}" for post_id in inserted), "feed"
+                )
+            return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                # already logged, the likes are retried on the next round
+                await asyncio.sleep(self.flush_interval)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._full = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # nothing acknowledged is lost on a clean shutdown
+        await self.flush()
+
+
+like_buffer = LikeBuffer(
+    max_size=config.LIKE_BUFFER_MAX_SIZE,
+    flush_interval=config.LIKE_BUFFER_FLUSH_SECONDS,
+    max_pending=config.LIKE_BUFFER_MAX_PENDING,
+    enabled=config.LIKE_BUFFER_ENABLED,
+)
+metrics.registry.register(
+    metrics.CallbackGauge(
+        "like_buffer_pending",
+        "Likes accepted and not written yet.",
+        lambda: len(like_buffer.pending),
+    )
+)
+metrics.registry.register(
+    metrics.CallbackCounter(
+        "like_buffer_rejected_total",
+        "Likes rejected with a 503 because the buffer was full.",
+        lambda: like_buffer.rejected,
+    )
+)
@@ -5,10 +5,25 @@ from asgi_correlation_id import CorrelationIdMiddleware
 from fastapi import FastAPI, HTTPException
 from fastapi.exception_handlers import http_exception_handler
 
-from src.configs.logging_config import configure_logging
+from src.config import config
+from src.configs.logging_config import configure_logging, stop_log_queue
 from src.database import database
+from src.like_buffer import like_buffer
+from src.metrics import MetricsMiddleware
+from src.migrations import migrate
+from src.query_profiler import QueryProfilerMiddleware
+from src.replicas import (
+    ReadYourWritesMiddleware,
+    connect_replicas,
+    disconnect_replicas,
+)
+from src.routers.batch import router as batch_router
+from src.routers.export import router as export_router
+from src.routers.metrics import router as metrics_router
 from src.routers.post import router as post_router
+from src.routers.search import router as search_router
 from src.routers.user import router as user_router
+from src.security import password_hash_pool
 
 logger = logging.getLogger(__name__)
 
@@ -17,19 +32,39 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     configure_logging()
+    migrate()  # brings an existing database up to the current schema
     await database.connect()  # run the database before the fastapi app and kinda stop by yielding until fastapi wake it up
+    await connect_replicas()
+    like_buffer.start()
     yield
+    # buffered likes are written before the database goes away
+    try:
+        await like_buffer.stop()
+    except Exception:
+        # the rest of the shutdown still has to run
+        logger.exception("Writing buffered likes on shutdown failed, they are lost")
+    await disconnect_replicas()
     await database.disconnect()
+    password_hash_pool.shutdown()
+    stop_log_queue()  # last, so the shutdown's own records are written too
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(MetricsMiddleware)
+if config.QUERY_PROFILER_ENABLED:
+    app.add_middleware(QueryProfilerMiddleware)
 app.add_middleware(CorrelationIdMiddleware)
 
 app.include_router(post_router)
+app.include_router(batch_router)
+app.include_router(export_router)
+app.include_router(search_router)
 app.include_router(user_router)
+app.include_router(metrics_router)
 
 
 @app.exception_handler(HTTPException)
 async def http_exception_handle_logging(request, exc):
-    logger.error(f"HttpException: {exc.status_code} {exc.detail}")
+    logger.error("HttpException: %s %s", exc.status_code, exc.detail)
     return await http_exception_handler(request, exc)
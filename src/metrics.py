@@ -0,0 +1,327 @@
+"""
+In-process metrics in the Prometheus text exposition format, served on /metrics.
+
+- `MetricsMiddleware` counts requests per route and status, times them, and
+  tracks how many are in flight
+- `instrument_queries()` times every query a `databases.Database` runs, and adds
+  it to the request's query count and time
+- with the query profiler on, the queries also go to the request's profile,
+  see src/query_profiler.py
+- gauges read their value when /metrics is scraped, e.g. the bcrypt pool's
+
+Everything is updated on the event loop thread, so no locks. Routes are labelled
+by their path template (/post/{post_id}), unmatched paths share one label.
+"""
+
+import bisect
+import functools
+import time
+from collections.abc import Callable, Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+import databases
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.query_profiler import current_profile
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines += [
+            f"{name}{labels} {format_value(value)}"
+            for name, labels, value in self.samples()
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        for label_values, value in sorted(self._values.items()):
+            yield self.name, format_labels(self.labels, label_values), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+
+class CallbackGauge(Metric):
+    """A gauge without labels whose value is read from `callback` on every scrape."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        yield self.name, "", self.callback()
+
+
+class CallbackCounter(CallbackGauge):
+    type = "counter"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: the count in each bucket (not cumulative), sum, count
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values[label_values] = ([0] * len(self.buckets), [0.0, 0])
+        counts, total = entry
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(counts):
+            counts[index] += 1
+        total[0] += value
+        total[1] += 1
+
+    def count(self, *label_values: str) -> int:
+        entry = self._values.get(label_values)
+        return entry[1][1] if entry else 0
+
+    def sum(self, *label_values: str) -> float:
+        entry = self._values.get(label_values)
+        return entry[1][0] if entry else 0.0
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        names = (*self.labels, "le")
+        for label_values, (counts, (total, count)) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts, strict=True):
+                cumulative += bucket_count
+                labels = format_labels(names, (*label_values, format_value(bound)))
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = format_labels(names, (*label_values, "+Inf"))
+            yield f"{self.name}_bucket", labels, count
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        # registering a name again replaces the metric, e.g. on reload
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+requests_total = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route and status code.",
+        ("method", "route", "status"),
+    )
+)
+request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from the request to the end of the response.",
+        ("method", "route"),
+    )
+)
+requests_in_progress = registry.register(
+    Gauge("http_requests_in_progress", "HTTP requests being handled.", ("method",))
+)
+request_queries = registry.register(
+    Histogram(
+        "http_request_db_queries",
+        "Database queries run by one request.",
+        ("method", "route"),
+        buckets=QUERY_COUNT_BUCKETS,
+    )
+)
+request_query_duration = registry.register(
+    Histogram(
+        "http_request_db_duration_seconds",
+        "Time one request spent waiting on database queries.",
+        ("method", "route"),
+    )
+)
+queries_total = registry.register(
+    Counter("db_queries_total", "Database queries by operation.", ("operation",))
+)
+query_duration = registry.register(
+    Histogram(
+        "db_query_duration_seconds",
+        "Database query time by operation.",
+        ("operation",),
+        buckets=QUERY_BUCKETS,
+    )
+)
+
+
+@dataclass
+class RequestQueries:
+    count: int = 0
+    seconds: float = 0.0
+
+
+# the queries of the request being handled, None outside of requests
+current_queries: ContextVar[RequestQueries | None] = ContextVar(
+    "current_queries", default=None
+)
+
+
+def record_query(operation: str, query, seconds: float) -> None:
+    queries_total.inc(operation)
+    query_duration.observe(seconds, operation)
+    queries = current_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += seconds
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add(query, seconds)
+
+
+def timed_query(operation: str, method: Callable) -> Callable:
+    @functools.wraps(method)
+    async def timed(query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(query, *args, **kwargs)
+        finally:
+            record_query(operation, query, time.perf_counter() - start)
+
+    return timed
+
+
+def timed_iteration(method: Callable) -> Callable:
+    # a streamed query counts once, for as long as its rows take to arrive
+    @functools.wraps(method)
+    async def timed(query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            async for row in method(query, *args, **kwargs):
+                yield row
+        finally:
+            record_query("iterate", query, time.perf_counter() - start)
+
+    return timed
+
+
+def instrument_queries(database: databases.Database) -> databases.Database:
+    """Wraps the query methods of this `database` object to record their time."""
+    for operation in ("fetch_all", "fetch_one", "fetch_val", "execute", "execute_many"):
+        setattr(
+            database, operation, timed_query(operation, getattr(database, operation))
+        )
+    database.iterate = timed_iteration(database.iterate)
+    return database
+
+
+def route_label(scope: Scope) -> str:
+    # FastAPI puts the matched route in the scope, its path is the template
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        queries = RequestQueries()
+        token = current_queries.set(queries)
+        requests_in_progress.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_in_progress.dec(method)
+            current_queries.reset(token)
+
+            route = route_label(scope)
+            requests_total.inc(method, route, status)
+            request_duration.observe(elapsed, method, route)
+            request_queries.observe(queries.count, method, route)
+            request_query_duration.observe(queries.seconds, method, route)
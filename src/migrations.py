@@ -0,0 +1,167 @@
+"""
+Versioned schema migrations.
+
+A fresh database gets the whole schema from `metadata.create_all`. An existing
+database keeps its tables, so every change made to them after the first release
+is a numbered step below. Applied versions are recorded in `schema_version` and
+each step only changes what is missing, so it is safe to re-run after a failure.
+
+    python -m src.migrations
+"""
+
+import logging
+
+import sqlalchemy
+
+from src.database import engine, like_table, metadata, schema_version_table
+from src.scripts.reconcile_counters import reconcile_queries
+
+logger = logging.getLogger(__name__)
+
+# schema of the first release (version 0), used by tests and benchmarks
+INITIAL_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR UNIQUE, password VARCHAR)",
+    (
+        "CREATE TABLE posts (id INTEGER PRIMARY KEY, body VARCHAR, "
+        "user_id INTEGER NOT NULL REFERENCES users (id))"
+    ),
+    (
+        "CREATE TABLE comments (id INTEGER PRIMARY KEY, body VARCHAR, "
+        "post_id INTEGER NOT NULL REFERENCES posts (id), "
+        "user_id INTEGER NOT NULL REFERENCES users (id))"
+    ),
+    (
+        "CREATE TABLE likes (id INTEGER PRIMARY KEY, body VARCHAR, "
+        "post_id INTEGER NOT NULL REFERENCES posts (id), "
+        "user_id INTEGER NOT NULL REFERENCES users (id))"
+    ),
+]
+
+
+def existing_columns(connection: sqlalchemy.Connection, table: str) -> set[str]:
+    return {
+        column["name"] for column in sqlalchemy.inspect(connection).get_columns(table)
+    }
+
+
+def add_post_counters(connection: sqlalchemy.Connection) -> None:
+    columns = existing_columns(connection, "posts")
+    for counter in ("like_count", "comment_count"):
+        if counter not in columns:
+            connection.execute(
+                sqlalchemy.text(
+                    f"ALTER TABLE posts ADD COLUMN {counter} INTEGER NOT NULL DEFAULT 0"
+                )
+            )
+    for query in reconcile_queries:
+        connection.execute(query)
+
+
+def add_secondary_indexes(connection: sqlalchemy.Connection) -> None:
+    # the unique index on likes can't be built while a user has liked a post twice
+    first_likes = sqlalchemy.select(sqlalchemy.func.min(like_table.c.id)).group_by(
+        like_table.c.post_id, like_table.c.user_id
+    )
+    connection.execute(like_table.delete().where(like_table.c.id.not_in(first_likes)))
+
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+    # removed duplicates were counted in like_count
+    for query in reconcile_queries:
+        connection.execute(query)
+
+
+# tables with a searchable body, see src/routers/search.py
+SEARCHABLE_TABLES = ("posts", "comments")
+
+
+def sqlite_search_index(table: str) -> list[str]:
+    # an external content FTS5 table stores only the index, the text stays in
+    # `table`, and the triggers keep the index in step with it
+    fts = f"{table}_fts"
+    return [
+        (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(body, "
+            f"content='{table}', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ),
+        (
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts} (rowid, body) VALUES (new.id, new.body); END"
+        ),
+        (
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts} ({fts}, rowid, body) "
+            "VALUES ('delete', old.id, old.body); END"
+        ),
+        (
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF body "
+            f"ON {table} BEGIN "
+            f"INSERT INTO {fts} ({fts}, rowid, body) "
+            "VALUES ('delete', old.id, old.body); "
+            f"INSERT INTO {fts} (rowid, body) VALUES (new.id, new.body); END"
+        ),
+        # indexes the rows written before the triggers existed
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    ]
+
+
+def postgresql_search_index(table: str) -> list[str]:
+    # no FTS5 on postgres, an expression index on the body's tsvector instead
+    return [
+        (
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_body_fts ON {table} "
+            "USING GIN (to_tsvector('simple', body))"
+        )
+    ]
+
+
+def add_search_index(connection: sqlalchemy.Connection) -> None:
+    if connection.dialect.name == "postgresql":
+        statements = postgresql_search_index
+    else:
+        statements = sqlite_search_index
+    for table in SEARCHABLE_TABLES:
+        for statement in statements(table):
+            connection.execute(sqlalchemy.text(statement))
+
+
+MIGRATIONS = [
+    (1, "Add like_count and comment_count to posts", add_post_counters),
+    (2, "Add secondary indexes and a unique like per user", add_secondary_indexes),
+    (3, "Add a full-text search index on post and comment bodies", add_search_index),
+]
+
+
+def current_version(connection: sqlalchemy.Connection) -> int:
+    query = sqlalchemy.select(sqlalchemy.func.max(schema_version_table.c.version))
+    return connection.execute(query).scalar() or 0
+
+
+def migrate(bind: sqlalchemy.Engine = engine) -> int:
+    with bind.begin() as connection:
+        # only creates what is missing - on an existing database that's schema_version
+        metadata.create_all(connection)
+        version = current_version(connection)
+
+    for migration_version, description, upgrade in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        logger.info("Applying migration %d: %s", migration_version, description)
+        with bind.begin() as connection:
+            upgrade(connection)
+            connection.execute(
+                schema_version_table.insert().values(
+                    version=migration_version, description=description
+                )
+            )
+        version = migration_version
+
+    logger.info("Database schema is at version %d", version)
+    return version
+
+
+if __name__ == "__main__":
+    print(f"Database schema is at version {migrate()}")
@@ -41,3 +41,23 @@ class PostLikeIn(BaseModel):
 class PostLike(PostLikeIn):
     id: int
     user_id: int
+
+
+class PendingPostLike(PostLikeIn):
+    # accepted into the like buffer, not written yet
+    user_id: int
+
+
+class BatchItemResult(BaseModel):
+    # one per submitted item, in the same order
+    id: int | None = None
+    error: str | None = None
+
+
+class SearchResult(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    kind: str  # "post" or "comment"
+    id: int
+    post_id: int  # the post itself, or the post commented on
+    body: str
+    user_id: int
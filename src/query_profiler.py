@@ -0,0 +1,122 @@
+"""
+Per-request SQL profiler, opt-in with QUERY_PROFILER_ENABLED.
+
+Every query the request runs through an instrumented database (see
+`src.metrics.instrument_queries`) is recorded with its time and its SQL with
+the values left out, so the same statement with other values has the same
+shape. At the end of the request:
+
+- the response gets `X-Query-Profile: queries=3, duration_ms=1.42, repeated=0`
+- a "Query profile" log line carries the count, the time and the shapes run
+  QUERY_PROFILER_REPEAT_THRESHOLD times or more - usually an N+1, a query per
+  row of an earlier result - and is a warning when there are such shapes
+
+Log records carry the request's correlation id, which ties the queries and the
+summary to the request. Queries a streaming response runs after its headers
+went out are in the log line, not in the header.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import config
+from src.statements import BoundStatement
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Query-Profile"
+
+
+def query_shape(query) -> str:
+    # a BoundStatement keeps its SQL, other queries are compiled for it
+    sql = query.statement.sql if isinstance(query, BoundStatement) else str(query)
+    return " ".join(sql.split())
+
+
+@dataclass
+class QueryProfile:
+    queries: list[tuple[str, float]] = field(default_factory=list)
+
+    def add(self, query, seconds: float) -> None:
+        shape = query_shape(query)
+        logger.debug("Query took %.2fms: %s", seconds * 1000, shape)
+        self.queries.append((shape, seconds))
+
+    @property
+    def seconds(self) -> float:
+        return sum(seconds for _, seconds in self.queries)
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        counts = Counter(shape for shape, _ in self.queries)
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+    def header(self, threshold: int) -> str:
+        return (
+            f"queries={len(self.queries)}, "
+            f"duration_ms={self.seconds * 1000:.2f}, "
+            f"repeated={len(self.repeated(threshold))}"
+        )
+
+
+# the profile of the request being handled, None when not profiling
+current_profile: ContextVar[QueryProfile | None] = ContextVar(
+    "current_profile", default=None
+)
+
+
+class QueryProfilerMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        repeat_threshold: int = config.QUERY_PROFILER_REPEAT_THRESHOLD,
+    ) -> None:
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+
+        async def send_with_profile(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                header = profile.header(self.repeat_threshold)
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (PROFILE_HEADER.lower().encode(), header.encode()),
+                ]
+            await send(message)
+
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            current_profile.reset(token)
+            self.log(scope, profile, time.perf_counter() - start)
+
+    def log(self, scope: Scope, profile: QueryProfile, seconds: float) -> None:
+        repeated = profile.repeated(self.repeat_threshold)
+        logger.log(
+            logging.WARNING if repeated else logging.INFO,
+            "Query profile: %d queries in %.2fms for %s %s",
+            len(profile.queries),
+            profile.seconds * 1000,
+            scope["method"],
+            scope["path"],
+            extra={
+                "query_count": len(profile.queries),
+                "query_ms": round(profile.seconds * 1000, 2),
+                "request_ms": round(seconds * 1000, 2),
+                "repeated_queries": [
+                    {"sql": shape, "count": count} for shape, count in repeated.items()
+                ],
+            },
+        )
@@ -0,0 +1,97 @@
+"""
+Primary/replica routing.
+
+Writes always go to `database`, the primary. Read-only handlers fetch through
+`read_database()`, which hands out the DATABASE_REPLICA_URLS round robin,
+except when the request has to see its own writes:
+
+- every request with a method other than GET/HEAD runs on the primary
+- after such a request the client gets a cookie for
+  REPLICA_READ_YOUR_WRITES_SECONDS, and its GETs run on the primary until the
+  cookie expires, long enough for the replicas to catch up
+
+Without replicas configured everything runs on the primary.
+"""
+
+import itertools
+import logging
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+
+import databases
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import config
+from src.database import create_database, database
+
+logger = logging.getLogger(__name__)
+
+READ_PRIMARY_COOKIE = "read_primary"
+
+replicas: list[databases.Database] = [
+    create_database(url) for url in config.DATABASE_REPLICA_URLS
+]
+
+use_primary: ContextVar[bool] = ContextVar("use_primary", default=False)
+_turn = itertools.count()
+
+
+def reading_from_replica() -> bool:
+    return bool(replicas) and not use_primary.get()
+
+
+def read_database() -> databases.Database:
+    if not reading_from_replica():
+        return database
+    return replicas[next(_turn) % len(replicas)]
+
+
+async def connect_replicas() -> None:
+    for replica in replicas:
+        await replica.connect()
+
+
+async def disconnect_replicas() -> None:
+    for replica in replicas:
+        await replica.disconnect()
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writing = scope["method"] not in ("GET", "HEAD")
+        token = use_primary.set(writing or self.has_cookie(scope))
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}=1; "
+                    f"Max-Age={config.REPLICA_READ_YOUR_WRITES_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", cookie.encode()),
+                ]
+            await send(message)
+
+        try:
+            if writing and replicas:
+                await self.app(scope, receive, send_with_cookie)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            use_primary.reset(token)
+
+    @staticmethod
+    def has_cookie(scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                return READ_PRIMARY_COOKIE in SimpleCookie(value.decode("latin-1"))
+        return False
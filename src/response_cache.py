@@ -0,0 +1,219 @@
+"""
+Response cache for the read endpoints.
+
+Responses are stored serialized, together with their ETag, under a key built
+from the route parameters and the current version of every tag the response
+depends on (e.g. "feed" or "post:1"). Write handlers bump the versions of the
+tags they change, so later reads miss the outdated entries, which are never
+read again and age out of the store. The in-memory backend bounds the versions
+too, see MemoryCacheBackend.
+"""
+
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from functools import lru_cache
+from typing import Any, Protocol
+
+import orjson
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from src.cache import TTLCache
+from src.config import config
+from src.replicas import reading_from_replica
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    async def counter(self, key: str) -> int: ...
+
+    async def incr(self, key: str) -> int: ...
+
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize: int, max_versions: int = 8192) -> None:
+        self.entries = TTLCache(maxsize=maxsize, ttl=0)
+        # a bounded LRU of its own - a version that starts over after eviction
+        # would revive old entries, so a missing version reads as the highest one
+        # evicted so far and every version only ever grows
+        self.counters: OrderedDict[str, int] = OrderedDict()
+        self.max_versions = max_versions
+        self.floor = 0
+
+    async def get(self, key: str) -> bytes | None:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.entries.set(key, value, ttl=ttl)
+
+    async def counter(self, key: str) -> int:
+        value = self.counters.get(key)
+        if value is None:
+            return self.floor
+        self.counters.move_to_end(key)
+        return value
+
+    async def incr(self, key: str) -> int:
+        value = self.counters[key] = await self.counter(key) + 1
+        self.counters.move_to_end(key)
+        while len(self.counters) > self.max_versions:
+            _, evicted = self.counters.popitem(last=False)
+            self.floor = max(self.floor, evicted)
+        return value
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.counters.clear()
+        self.floor = 0
+
+
+class RedisCacheBackend:
+    """Shares the cache between processes, works with a redis.asyncio.Redis client."""
+
+    def __init__(self, client: Any, prefix: str = "mediaapp:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(self.prefix + key, value, ex=max(int(ttl), 1))
+
+    async def counter(self, key: str) -> int:
+        return int(await self.client.get(self.prefix + key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self.prefix + key)
+
+
+@lru_cache
+def type_adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+def serialize(response_type: Any, content: Any) -> bytes:
+    # the same validation FastAPI does for response_model, straight to JSON bytes
+    adapter = type_adapter(response_type)
+    return adapter.dump_json(adapter.validate_python(content))
+
+
+def row_to_dict(row: Any) -> dict:
+    # orjson calls this for the databases Records; the driver's row inside holds
+    # the values already converted, reading them through the Record is much slower
+    values = getattr(row, "_row", None)
+    if values is None:
+        raise TypeError(f"{type(row).__name__} is not JSON serializable")
+    fields = getattr(values, "_fields", None)
+    if fields is None:  # an asyncpg Record
+        return dict(values.items())
+    return dict(zip(fields, values, strict=True))
+
+
+def serialize_rows(response_type: Any, content: Any) -> bytes:
+    """
+    Fast path for content made of rows, dicts and lists: the rows go to JSON as
+    they are, without validation. Only for loaders whose queries select exactly
+    the fields of `response_type`, with matching types.
+    """
+    # column names can be str subclasses (sqlalchemy's quoted_name), hence the option
+    return orjson.dumps(content, default=row_to_dict, option=orjson.OPT_NON_STR_KEYS)
+
+
+# (response_type, content) -> JSON body
+Serializer = Callable[[Any, Any], bytes]
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def pack(headers: dict[str, str], body: bytes) -> bytes:
+    return json.dumps(headers).encode() + b"\n" + body
+
+
+def unpack(entry: bytes) -> tuple[dict[str, str], bytes]:
+    headers, body = entry.split(b"\n", 1)
+    return json.loads(headers), body
+
+
+def make_response(request: Request, headers: dict[str, str], body: bytes) -> Response:
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# load() returns the response content and extra headers
+Loader = Callable[[], Awaitable[tuple[Any, dict[str, str]]]]
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+
+    async def versioned_key(self, key: str, tags: list[str]) -> str:
+        versions = [await self.backend.counter(f"version:{tag}") for tag in tags]
+        return f"{key}@" + ",".join(map(str, versions))
+
+    async def respond(
+        self,
+        request: Request,
+        key: str,
+        tags: list[str],
+        response_type: Any,
+        load: Loader,
+        serializer: Serializer = serialize,
+    ) -> Response:
+        if not self.enabled:
+            content, headers = await load()
+            body = serializer(response_type, content)
+            return make_response(request, {**headers, "ETag": make_etag(body)}, body)
+
+        ttl = self.ttl
+        if reading_from_replica():
+            # a lagging replica can return data older than the versions read here -
+            # such entries are never served to clients reading their own writes
+            # and expire once the replicas have caught up
+            key = f"{key}:replica"
+            ttl = min(ttl, config.REPLICA_READ_YOUR_WRITES_SECONDS)
+
+        # versions are read before loading, a write that lands while loading
+        # makes this entry outdated instead of hiding the write
+        versioned_key = await self.versioned_key(key, tags)
+        entry = await self.backend.get(versioned_key)
+        if entry is not None:
+            logger.debug("Response cache hit", extra={"cache_key": versioned_key})
+            return make_response(request, *unpack(entry))
+
+        logger.debug("Response cache miss", extra={"cache_key": versioned_key})
+        content, headers = await load()
+        body = serializer(response_type, content)
+        headers = {**headers, "ETag": make_etag(body)}
+        await self.backend.set(versioned_key, pack(headers, body), ttl)
+        return make_response(request, headers, body)
+
+    async def invalidate(self, *tags: str) -> None:
+        if not self.enabled:
+            return
+        for tag in tags:
+            await self.backend.incr(f"version:{tag}")
+
+
+response_cache = ResponseCache(
+    MemoryCacheBackend(
+        maxsize=config.RESPONSE_CACHE_SIZE,
+        max_versions=config.RESPONSE_CACHE_MAX_VERSIONS,
+    ),
+    ttl=config.RESPONSE_CACHE_TTL_SECONDS,
+    enabled=config.RESPONSE_CACHE_ENABLED,
+)
@@ -0,0 +1,163 @@
+import logging
+from collections import Counter
+from typing import Annotated, Any
+
+import sqlalchemy
+from fastapi import APIRouter, Body, Depends
+from pydantic import BaseModel, ValidationError
+
+from src.database import (
+    comment_table,
+    database,
+    increment_counters,
+    like_table,
+    post_table,
+)
+from src.models.post import BatchItemResult, CommentIn, PostLikeIn, UserPostIn
+from src.models.user import User
+from src.response_cache import response_cache
+from src.routers.post import insert_likes
+from src.security import get_current_user
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 500
+
+# items are validated one by one, so one bad item doesn't reject the whole batch
+BatchBody = Annotated[list[Any], Body(min_length=1, max_length=MAX_BATCH_SIZE)]
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, detail['loc'])) or 'item'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def validate_items(
+    model: type[BaseModel], items: list[Any]
+) -> tuple[list[BatchItemResult], list[tuple[int, Any]]]:
+    results = [BatchItemResult() for _ in items]
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            results[index].error = validation_message(e)
+    return results, valid
+
+
+@router.post("/post/batch", response_model=list[BatchItemResult])
+async def create_posts(
+    items: BatchBody, current_user: Annotated[User, Depends(get_current_user)]
+):
+    logger.info("Creating %d posts", len(items))
+
+    results, valid = validate_items(UserPostIn, items)
+    if not valid:
+        return results
+
+    rows = [{**post.model_dump(), "user_id": current_user.id} for _, post in valid]
+    query = post_table.insert().values(rows).returning(post_table.c.id)
+
+    logger.debug(query)
+
+    inserted = await database.fetch_all(query)
+    # ids are assigned in the order of the VALUES rows, RETURNING has no set order
+    for (index, _), post_id in zip(valid, sorted(row.id for row in inserted)):
+        results[index].id = post_id
+
+    await response_cache.invalidate("feed")
+    return results
+
+
+@router.post("/comment/batch", response_model=list[BatchItemResult])
+async def create_comments(
+    items: BatchBody, current_user: Annotated[User, Depends(get_current_user)]
+):
+    logger.info("Creating %d comments", len(items))
+
+    results, valid = validate_items(CommentIn, items)
+    if not valid:
+        return results
+
+    post_ids = {comment.post_id for _, comment in valid}
+    query = sqlalchemy.select(post_table.c.id).where(post_table.c.id.in_(post_ids))
+
+    async with database.transaction():
+        existing = {row.id for row in await database.fetch_all(query)}
+        accepted = []
+        for index, comment in valid:
+            if comment.post_id in existing:
+                accepted.append((index, comment))
+            else:
+                results[index].error = "Post not found"
+        if not accepted:
+            return results
+
+        rows = [
+            {**comment.model_dump(), "user_id": current_user.id}
+            for _, comment in accepted
+        ]
+        query = comment_table.insert().values(rows).returning(comment_table.c.id)
+
+        logger.debug(query)
+
+        inserted = await database.fetch_all(query)
+        counts = Counter(comment.post_id for _, comment in accepted)
+        await database.execute(increment_counters("comment_count", counts))
+
+    for (index, _), comment_id in zip(accepted, sorted(row.id for row in inserted)):
+        results[index].id = comment_id
+
+    await response_cache.invalidate(
+        *(f"comments:{post_id}" for post_id in counts), "feed-comments"
+    )
+    return results
+
+
+@router.post("/like/batch", response_model=list[BatchItemResult])
+async def like_posts(
+    items: BatchBody, current_user: Annotated[User, Depends(get_current_user)]
+):
+    logger.info("Liking %d posts", len(items))
+
+    results, valid = validate_items(PostLikeIn, items)
+    if not valid:
+        return results
+
+    post_ids = list(dict.fromkeys(like.post_id for _, like in valid))
+    query = insert_likes(post_ids, current_user.id)
+
+    logger.debug(query)
+
+    async with database.transaction():
+        inserted = {row.post_id: row.id for row in await database.fetch_all(query)}
+        if inserted:
+            counts = dict.fromkeys(inserted, 1)
+            await database.execute(increment_counters("like_count", counts))
+
+    # posts that got no new like were either liked before or don't exist
+    like_ids = dict(inserted)
+    not_inserted = [post_id for post_id in post_ids if post_id not in inserted]
+    if not_inserted:
+        query = like_table.select().where(
+            like_table.c.user_id == current_user.id,
+            like_table.c.post_id.in_(not_inserted),
+        )
+        for like in await database.fetch_all(query):
+            like_ids[like.post_id] = like.id
+
+    for index, like in valid:
+        if like.post_id in like_ids:
+            results[index].id = like_ids[like.post_id]
+        else:
+            results[index].error = "Post not found"
+
+    if inserted:
+        await response_cache.invalidate(
+            *(f"post:{post_id}" for post_id in inserted), "feed"
+        )
+    return results
@@ -0,0 +1,111 @@
+"""
+NDJSON export of posts and comments, one JSON object per line in id order.
+
+The rows are read in pages of EXPORT_PAGE_ROWS, each starting after the last
+id sent, and written out in chunks of about EXPORT_CHUNK_BYTES, so an export of
+any size holds only one page in memory. No query or transaction stays open
+while the client reads, which on SQLite would block every write until the
+download ends. For incremental exports pass the last id received as
+`since_id`; `max_id` caps the range, `user_id` narrows it to one author.
+"""
+
+import logging
+from collections.abc import AsyncIterator
+from typing import Annotated
+
+import orjson
+import sqlalchemy
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from src.database import comment_table, post_table
+from src.models.user import User
+from src.replicas import read_database
+from src.response_cache import row_to_dict
+from src.routers.post import select_post_and_likes
+from src.security import get_current_user
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "application/x-ndjson"
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_PAGE_ROWS = 1000
+
+
+class ExportFilters:
+    def __init__(
+        self,
+        user_id: int | None = None,
+        since_id: Annotated[int | None, Query(ge=0)] = None,
+        max_id: Annotated[int | None, Query(ge=0)] = None,
+    ) -> None:
+        self.user_id = user_id
+        self.since_id = since_id
+        self.max_id = max_id
+
+    def apply(self, query, table: sqlalchemy.Table):
+        # exclusive since_id, inclusive max_id
+        if self.user_id is not None:
+            query = query.where(table.c.user_id == self.user_id)
+        if self.since_id is not None:
+            query = query.where(table.c.id > self.since_id)
+        if self.max_id is not None:
+            query = query.where(table.c.id <= self.max_id)
+        return query.order_by(table.c.id)
+
+
+async def ndjson_lines(query, table: sqlalchemy.Table) -> AsyncIterator[bytes]:
+    # query is in id order, so each page continues where the last one ended
+    chunk = bytearray()
+    rows = 0
+    page_query = query
+    while True:
+        page = await read_database().fetch_all(page_query.limit(EXPORT_PAGE_ROWS))
+        for row in page:
+            chunk += orjson.dumps(
+                row, default=row_to_dict, option=orjson.OPT_NON_STR_KEYS
+            )
+            chunk += b"\n"
+            if len(chunk) >= EXPORT_CHUNK_BYTES:
+                yield bytes(chunk)
+                chunk.clear()
+        rows += len(page)
+        if len(page) < EXPORT_PAGE_ROWS:
+            break
+        page_query = query.where(table.c.id > page[-1].id)
+    if chunk:
+        yield bytes(chunk)
+    logger.info("Exported %d rows", rows)
+
+
+@router.get("/export/posts", response_class=StreamingResponse)
+async def export_posts(
+    filters: Annotated[ExportFilters, Depends()],
+    current_user: Annotated[User, Depends(get_current_user)],
+):
+    logger.info("Exporting posts")
+
+    query = filters.apply(select_post_and_likes, post_table)
+
+    logger.debug(query)
+
+    return StreamingResponse(ndjson_lines(query, post_table), media_type=NDJSON)
+
+
+@router.get("/export/comments", response_class=StreamingResponse)
+async def export_comments(
+    filters: Annotated[ExportFilters, Depends()],
+    current_user: Annotated[User, Depends(get_current_user)],
+    post_id: int | None = None,
+):
+    logger.info("Exporting comments")
+
+    query = filters.apply(comment_table.select(), comment_table)
+    if post_id is not None:
+        query = query.where(comment_table.c.post_id == post_id)
+
+    logger.debug(query)
+
+    return StreamingResponse(ndjson_lines(query, comment_table), media_type=NDJSON)
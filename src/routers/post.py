@@ -1,14 +1,27 @@
+import base64
+import binascii
+import json
 import logging
 from enum import Enum
+from functools import lru_cache, partial
 from typing import Annotated
 
 import sqlalchemy
-from fastapi import APIRouter, Depends, HTTPException
-
-from src.database import comment_table, database, like_table, post_table
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+
+from src.database import (
+    comment_table,
+    database,
+    increment_counter,
+    like_table,
+    post_table,
+    upsert,
+)
+from src.like_buffer import like_buffer
 from src.models.post import (
     Comment,
     CommentIn,
+    PendingPostLike,
     PostLike,
     PostLikeIn,
     UserPost,
@@ -17,24 +30,38 @@ from src.models.post import (
     UserPostWithLikes,
 )
 from src.models.user import User
+from src.replicas import read_database
+from src.response_cache import response_cache, serialize_rows
 from src.security import get_current_user
+from src.statements import CachedStatement
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
-select_post_and_likes = (
-    sqlalchemy.select(post_table, sqlalchemy.func.count(like_table.c.id).label("likes"))
-    .select_from(post_table.outerjoin(like_table))
-    .group_by(post_table.c.id)
-    .group_by(post_table.c.id)
+select_post_and_likes = sqlalchemy.select(
+    post_table.c.id,
+    post_table.c.body,
+    post_table.c.user_id,
+    post_table.c.like_count.label("likes"),
+)
+
+
+select_post = CachedStatement(
+    post_table.select().where(post_table.c.id == sqlalchemy.bindparam("post_id"))
+)
+
+insert_post = CachedStatement(
+    post_table.insert().values(
+        body=sqlalchemy.bindparam("body"), user_id=sqlalchemy.bindparam("user_id")
+    )
 )
 
 
 async def find_post(post_id: int):
-    logger.info(f"Finding post with id {post_id}")
+    logger.info("Finding post with id %s", post_id)
 
-    query = post_table.select().where(post_table.c.id == post_id)
+    query = select_post(post_id=post_id)
 
     logger.debug(query)
     return await database.fetch_one(query)
@@ -47,11 +74,12 @@ async def create_post(
     logger.info("Creating post")
 
     data = {**post.model_dump(), "user_id": current_user.id}
-    query = post_table.insert().values(data)
+    query = insert_post(**data)
 
     logger.debug(query)
 
     last_record_id = await database.execute(query)
+    await response_cache.invalidate("feed")
     return {**data, "id": last_record_id}
 
 
@@ -61,20 +89,152 @@ class PostSorting(str, Enum):
     most_likes = "most_likes"
 
 
-@router.get("/post", response_model=list[UserPostWithLikes])
-async def get_all_posts(sorting: PostSorting = PostSorting.new):
-    logger.info("Getting all posts")
+def encode_cursor(post) -> str:
+    # opaque for the client - base64 of the keyset (id, likes) of the last post on the page
+    keyset = {"id": post.id, "likes": post.likes}
+    return base64.urlsafe_b64encode(json.dumps(keyset).encode()).decode()
 
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        keyset = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {"id": int(keyset["id"]), "likes": int(keyset["likes"])}
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+def paginate_posts(query, sorting: PostSorting, cursor: dict | None):
+    likes = post_table.c.like_count
+
+    # keyset pagination - every page starts where the previous one ended,
+    # so the database never has to skip over the rows already sent
     if sorting == PostSorting.new:
-        query = select_post_and_likes.order_by(post_table.c.id.desc())
+        if cursor:
+            query = query.where(post_table.c.id < cursor["id"])
+        return query.order_by(post_table.c.id.desc())
     if sorting == PostSorting.old:
-        query = select_post_and_likes.order_by(post_table.c.id.asc())
+        if cursor:
+            query = query.where(post_table.c.id > cursor["id"])
+        return query.order_by(post_table.c.id.asc())
     if sorting == PostSorting.most_likes:
-        query = select_post_and_likes.order_by(sqlalchemy.desc("likes"))
+        # posts with the same number of likes are ordered by id, so the order is stable
+        if cursor:
+            query = query.where(
+                sqlalchemy.or_(
+                    likes < cursor["likes"],
+                    sqlalchemy.and_(
+                        likes == cursor["likes"], post_table.c.id < cursor["id"]
+                    ),
+                )
+            )
+        return query.order_by(likes.desc(), post_table.c.id.desc())
+
+
+@lru_cache
+def select_feed_page(sorting: PostSorting, after_cursor: bool) -> CachedStatement:
+    # one statement per sorting for the first page, and one for the pages after it
+    cursor = None
+    if after_cursor:
+        cursor = {
+            "id": sqlalchemy.bindparam("cursor_id"),
+            "likes": sqlalchemy.bindparam("cursor_likes"),
+        }
+    query = paginate_posts(select_post_and_likes, sorting, cursor)
+    return CachedStatement(query.limit(sqlalchemy.bindparam("limit")))
+
+
+def ranked_comments(condition):
+    # comments numbered 1, 2, ... in id order within each post
+    return (
+        sqlalchemy.select(
+            comment_table,
+            sqlalchemy.func.row_number()
+            .over(partition_by=comment_table.c.post_id, order_by=comment_table.c.id)
+            .label("rank"),
+        )
+        .where(condition)
+        .subquery()
+    )
+
+
+def select_top_comments(post_ids: list[int], limit: int):
+    # the first `limit` comments of every post in one query
+    ranked = ranked_comments(comment_table.c.post_id.in_(post_ids))
+    return (
+        sqlalchemy.select(
+            ranked.c.id, ranked.c.body, ranked.c.post_id, ranked.c.user_id
+        )
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.post_id, ranked.c.id)
+    )
+
+
+async def with_comments(posts: list, limit: int) -> list[dict]:
+    query = select_top_comments([post.id for post in posts], limit)
 
     logger.debug(query)
 
-    return await database.fetch_all(query)
+    comments = {post.id: [] for post in posts}
+    for comment in await read_database().fetch_all(query):
+        comments[comment.post_id].append(comment)
+    return [{"post": post, "comments": comments[post.id]} for post in posts]
+
+
+async def load_posts(
+    sorting: PostSorting,
+    limit: int,
+    keyset: dict | None,
+    include_comments: int | None,
+) -> tuple[list, dict[str, str]]:
+    # one extra row tells if there is a next page
+    values = {"limit": limit + 1}
+    if keyset:
+        values.update(cursor_id=keyset["id"], cursor_likes=keyset["likes"])
+    query = select_feed_page(sorting, keyset is not None)(**values)
+
+    logger.debug(query)
+
+    posts = await read_database().fetch_all(query)
+    headers = {}
+    if len(posts) > limit:
+        posts = posts[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(posts[-1])
+    if include_comments and posts:
+        return await with_comments(posts, include_comments), headers
+    return posts, headers
+
+
+Feed = list[UserPostWithLikes] | list[UserPostWithComments]
+
+
+@router.get("/post", response_model=Feed)
+async def get_all_posts(
+    request: Request,
+    sorting: PostSorting = PostSorting.new,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: str | None = None,
+    include_comments: Annotated[int | None, Query(ge=1, le=50)] = None,
+):
+    logger.info("Getting all posts")
+
+    keyset = decode_cursor(cursor) if cursor else None
+    return await response_cache.respond(
+        request,
+        key=f"feed:{sorting.value}:{limit}:{cursor}:{include_comments}",
+        tags=["feed", "feed-comments"] if include_comments else ["feed"],
+        response_type=Feed,
+        load=partial(load_posts, sorting, limit, keyset, include_comments),
+        serializer=serialize_rows,
+    )
+
+
+insert_comment = CachedStatement(
+    comment_table.insert().values(
+        body=sqlalchemy.bindparam("body"),
+        post_id=sqlalchemy.bindparam("post_id"),
+        user_id=sqlalchemy.bindparam("user_id"),
+    )
+)
 
 
 @router.post("/comment", response_model=Comment, status_code=201)
@@ -88,50 +248,221 @@ async def create_comment(
         raise HTTPException(status_code=404, detail="Post not found")
 
     data = {**comment.model_dump(), "user_id": current_user.id}
-    query = comment_table.insert().values(data)
+    query = insert_comment(**data)
 
     logger.debug(query)
 
-    last_record_id = await database.execute(query)
+    async with database.transaction():
+        last_record_id = await database.execute(query)
+        await database.execute(increment_counter("comment_count", comment.post_id, 1))
+    await response_cache.invalidate(f"comments:{comment.post_id}", "feed-comments")
     return {**data, "id": last_record_id}
 
 
+select_comments = CachedStatement(
+    comment_table.select().where(
+        comment_table.c.post_id == sqlalchemy.bindparam("post_id")
+    )
+)
+
+
+async def load_comments(post_id: int) -> tuple[list, dict[str, str]]:
+    query = select_comments(post_id=post_id)
+
+    logger.debug(query)
+    return await read_database().fetch_all(query), {}
+
+
 @router.get("/post/{post_id}/comment", response_model=list[Comment])
-async def get_comments_on_post(post_id: int):
+async def get_comments_on_post(request: Request, post_id: int):
     logger.info("Getting comments on post")
 
-    query = comment_table.select().where(comment_table.c.post_id == post_id)
-
+    return await response_cache.respond(
+        request,
+        key=f"comments:{post_id}",
+        tags=[f"comments:{post_id}"],
+        response_type=list[Comment],
+        load=partial(load_comments, post_id),
+        serializer=serialize_rows,
+    )
+
+
+@lru_cache
+def select_post_with_comments(limited: bool) -> CachedStatement:
+    # one row per comment, each repeating the post - or a single row without comments
+    post_id = sqlalchemy.bindparam("post_id")
+    comments = comment_table
+    on = comments.c.post_id == post_table.c.id
+    if limited:
+        comments = ranked_comments(comment_table.c.post_id == post_id)
+        on = sqlalchemy.and_(
+            comments.c.post_id == post_table.c.id,
+            comments.c.rank <= sqlalchemy.bindparam("comment_limit"),
+        )
+    return CachedStatement(
+        select_post_and_likes.add_columns(
+            comments.c.id.label("comment_id"),
+            comments.c.body.label("comment_body"),
+            comments.c.user_id.label("comment_user_id"),
+        )
+        .select_from(post_table.outerjoin(comments, on))
+        .where(post_table.c.id == post_id)
+        .order_by(comments.c.id)
+    )
+
+
+async def load_post_with_comments(
+    post_id: int, comment_limit: int | None
+) -> tuple[dict, dict[str, str]]:
+    statement = select_post_with_comments(comment_limit is not None)
+    query = statement(post_id=post_id, comment_limit=comment_limit)
     logger.debug(query)
-    return await database.fetch_all(query)
+    rows = await read_database().fetch_all(query)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    # the rows carry the comment columns too, only the post's go in the response
+    post = {
+        "id": rows[0].id,
+        "body": rows[0].body,
+        "user_id": rows[0].user_id,
+        "likes": rows[0].likes,
+    }
+    comments = [
+        {
+            "id": row.comment_id,
+            "body": row.comment_body,
+            "post_id": post["id"],
+            "user_id": row.comment_user_id,
+        }
+        for row in rows
+        if row.comment_id is not None
+    ]
+    return {"post": post, "comments": comments}, {}
 
 
 @router.get("/post/{post_id}", response_model=UserPostWithComments)
-async def get_post_with_comments(post_id: int):
+async def get_post_with_comments(
+    request: Request,
+    post_id: int,
+    comment_limit: Annotated[int | None, Query(ge=1)] = None,
+):
     logger.info("Get post with comments")
-    query = select_post_and_likes.where(post_table.c.id == post_id)
-    logger.debug(query)
-    post = await database.fetch_one(query)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
 
-    return {"post": post, "comments": await get_comments_on_post(post_id)}
+    return await response_cache.respond(
+        request,
+        key=f"post:{post_id}:{comment_limit}",
+        tags=[f"post:{post_id}", f"comments:{post_id}"],
+        response_type=UserPostWithComments,
+        load=partial(load_post_with_comments, post_id, comment_limit),
+        serializer=serialize_rows,
+    )
+
+
+def insert_likes_where(condition, user_id):
+    # selecting the posts makes a missing post insert nothing, just like a repeated
+    # like - sqlite doesn't enforce foreign keys unless asked to on every connection
+    posts = sqlalchemy.select(post_table.c.id, user_id).where(condition)
+    return (
+        upsert(like_table)
+        .from_select(["post_id", "user_id"], posts)
+        .on_conflict_do_nothing(index_elements=["post_id", "user_id"])
+        .returning(like_table.c.id, like_table.c.post_id)
+    )
+
+
+def insert_likes(post_ids: list[int], user_id: int):
+    return insert_likes_where(
+        post_table.c.id.in_(post_ids), sqlalchemy.literal(user_id)
+    )
+
+
+insert_like = CachedStatement(
+    insert_likes_where(
+        post_table.c.id == sqlalchemy.bindparam("post_id"),
+        sqlalchemy.bindparam("user_id", type_=sqlalchemy.Integer),
+    )
+)
 
+select_like = CachedStatement(
+    like_table.select().where(
+        like_table.c.post_id == sqlalchemy.bindparam("post_id"),
+        like_table.c.user_id == sqlalchemy.bindparam("user_id"),
+    )
+)
 
-@router.post("/like", response_model=PostLike, status_code=201)
+delete_like = CachedStatement(
+    like_table.delete()
+    .where(
+        like_table.c.post_id == sqlalchemy.bindparam("post_id"),
+        like_table.c.user_id == sqlalchemy.bindparam("user_id"),
+    )
+    .returning(like_table.c.id)
+)
+
+
+@router.post("/like", response_model=PostLike | PendingPostLike, status_code=201)
 async def like_post(
-    like: PostLikeIn, current_user: Annotated[User, Depends(get_current_user)]
+    like: PostLikeIn,
+    current_user: Annotated[User, Depends(get_current_user)],
+    response: Response,
 ):
     logger.info("Liking post")
 
-    post = await find_post(like.post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    if like_buffer.enabled:
+        like_buffer.add(like.post_id, current_user.id)
+        response.status_code = 202
+        return {**like.model_dump(), "user_id": current_user.id}
 
-    data = {**like.model_dump(), "user_id": current_user.id}
-    query = like_table.insert().values(data)
+    query = insert_like(post_id=like.post_id, user_id=current_user.id)
 
     logger.debug(query)
 
-    last_record_id = await database.execute(query)
-    return {**data, "id": last_record_id}
+    async with database.transaction():
+        inserted = await database.fetch_one(query)
+        if inserted:
+            await database.execute(increment_counter("like_count", like.post_id, 1))
+
+    if not inserted:
+        # liking twice is not an error, the client gets the existing like back
+        existing = await database.fetch_one(
+            select_like(post_id=like.post_id, user_id=current_user.id)
+        )
+        if not existing:
+            raise HTTPException(status_code=404, detail="Post not found")
+        response.status_code = 200
+        return existing
+
+    await response_cache.invalidate(f"post:{like.post_id}", "feed")
+    return {**like.model_dump(), "user_id": current_user.id, "id": inserted.id}
+
+
+@router.delete("/like/{post_id}", status_code=204)
+async def unlike_post(
+    post_id: int, current_user: Annotated[User, Depends(get_current_user)]
+):
+    logger.info("Unliking post")
+
+    # a pending like may also have been written by an earlier flush, so the
+    # database is checked either way
+    discarded = like_buffer.enabled and await like_buffer.discard(
+        post_id, current_user.id
+    )
+
+    query = delete_like(post_id=post_id, user_id=current_user.id)
+
+    logger.debug(query)
+
+    async with database.transaction():
+        deleted = await database.fetch_one(query)
+        if deleted:
+            await database.execute(increment_counter("like_count", post_id, -1))
+
+    if not deleted:
+        if discarded:
+            # never written, so nothing to invalidate
+            return Response(status_code=204)
+        raise HTTPException(status_code=404, detail="Like not found")
+
+    await response_cache.invalidate(f"post:{post_id}", "feed")
+    return Response(status_code=204)
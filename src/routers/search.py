@@ -0,0 +1,158 @@
+"""
+Full-text search over post and comment bodies.
+
+`q` is split into words and a result has to contain all of them; a word ending
+in `*` matches every word starting with it (`fast*` finds "faster"). Results
+are ranked best first - bm25 on SQLite, ts_rank on PostgreSQL - among the
+newest MAX_RANKED_MATCHES posts and comments that match, and paged with `limit`
+and `offset`; the response has `X-Next-Offset` when there are more.
+
+The index is built and kept up to date by the database (migration 3 in
+src/migrations.py), so writes need no extra work here.
+"""
+
+import logging
+import re
+from enum import Enum
+from functools import lru_cache
+from typing import Annotated
+
+import sqlalchemy
+from fastapi import APIRouter, HTTPException, Query, Response
+
+from src.database import comment_table, database, post_table
+from src.models.post import SearchResult
+from src.replicas import read_database
+from src.statements import CachedStatement
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# scoring a match is the expensive part, so a word that is in most posts would
+# score most of the table - only the newest matches of each kind are ranked
+MAX_RANKED_MATCHES = 10_000
+MAX_SEARCH_OFFSET = 1000
+
+# a word with an optional prefix marker, anything else in q is ignored
+SEARCH_TERM = re.compile(r"\w+\*?")
+
+
+class SearchKind(str, Enum):
+    all = "all"
+    posts = "posts"
+    comments = "comments"
+
+
+def match_query(q: str, dialect: str) -> str:
+    # quoted terms, so nothing the user types is read as search syntax
+    terms = SEARCH_TERM.findall(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query has no words")
+    if dialect == "postgresql":
+        return " & ".join(
+            f"{term[:-1]}:*" if term.endswith("*") else term for term in terms
+        )
+    return " ".join(
+        f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"' for term in terms
+    )
+
+
+def sqlite_candidates(table: sqlalchemy.Table):
+    fts_name = f"{table.name}_fts"
+    fts = sqlalchemy.table(
+        fts_name,
+        sqlalchemy.column("rowid"),
+        sqlalchemy.column("rank"),
+        sqlalchemy.column(fts_name),
+    )
+    # FTS5 reads the matches in rowid order itself, so the limit stops it early
+    return (
+        sqlalchemy.select(fts.c.rowid.label("id"), fts.c.rank)
+        .where(fts.c[fts_name].op("MATCH")(sqlalchemy.bindparam("match")))
+        .order_by(fts.c.rowid.desc())
+        .limit(MAX_RANKED_MATCHES)
+        .subquery()
+    )
+
+
+def postgresql_candidates(table: sqlalchemy.Table):
+    # the same expression as the GIN index, or the index isn't used
+    config = sqlalchemy.literal_column("'simple'")
+    document = sqlalchemy.func.to_tsvector(config, table.c.body)
+    query = sqlalchemy.func.to_tsquery(config, sqlalchemy.bindparam("match"))
+    return (
+        sqlalchemy.select(
+            table.c.id,
+            # negated, so that lower is better as with bm25
+            (-sqlalchemy.func.ts_rank(document, query)).label("rank"),
+        )
+        .where(document.op("@@")(query))
+        .order_by(table.c.id.desc())
+        .limit(MAX_RANKED_MATCHES)
+        .subquery()
+    )
+
+
+def select_matches(table: sqlalchemy.Table, kind: str, post_id, candidates):
+    found = candidates(table)
+    return sqlalchemy.select(
+        sqlalchemy.literal_column(f"'{kind}'").label("kind"),
+        table.c.id,
+        post_id.label("post_id"),
+        table.c.body,
+        table.c.user_id,
+        found.c.rank,
+    ).select_from(found.join(table, table.c.id == found.c.id))
+
+
+@lru_cache
+def select_search_page(kind: SearchKind, dialect: str) -> CachedStatement:
+    if dialect == "postgresql":
+        candidates = postgresql_candidates
+    else:
+        candidates = sqlite_candidates
+    selects = []
+    if kind in (SearchKind.all, SearchKind.posts):
+        selects.append(select_matches(post_table, "post", post_table.c.id, candidates))
+    if kind in (SearchKind.all, SearchKind.comments):
+        selects.append(
+            select_matches(
+                comment_table, "comment", comment_table.c.post_id, candidates
+            )
+        )
+    found = sqlalchemy.union_all(*selects).subquery()
+    return CachedStatement(
+        sqlalchemy.select(
+            found.c.kind, found.c.id, found.c.post_id, found.c.body, found.c.user_id
+        )
+        # ties broken by kind and id, so the pages don't overlap
+        .order_by(found.c.rank, found.c.kind, found.c.id)
+        .limit(sqlalchemy.bindparam("limit"))
+        .offset(sqlalchemy.bindparam("offset"))
+    )
+
+
+@router.get("/search", response_model=list[SearchResult])
+async def search(
+    response: Response,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    kind: SearchKind = SearchKind.all,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    offset: Annotated[int, Query(ge=0, le=MAX_SEARCH_OFFSET)] = 0,
+):
+    logger.info("Searching %s", kind.value)
+
+    dialect = database.url.dialect
+    # one extra row tells if there is a next page
+    query = select_search_page(kind, dialect)(
+        match=match_query(q, dialect), limit=limit + 1, offset=offset
+    )
+
+    logger.debug(query)
+
+    results = await read_database().fetch_all(query)
+    if len(results) > limit:
+        results = results[:limit]
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return results
@@ -1,5 +1,6 @@
 import logging
 
+import sqlalchemy
 from fastapi import APIRouter, HTTPException, status
 
 from src.database import database, user_table
@@ -7,13 +8,21 @@ from src.models.user import UserIn
 from src.security import (
     authenticate_user,
     create_access_token,
-    get_password_hash,
+    get_password_hash_async,
     get_user,
+    invalidate_user,
 )
+from src.statements import CachedStatement
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+insert_user = CachedStatement(
+    user_table.insert().values(
+        email=sqlalchemy.bindparam("email"), password=sqlalchemy.bindparam("password")
+    )
+)
+
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register_user(user: UserIn):
@@ -23,12 +32,13 @@ async def register_user(user: UserIn):
             detail="An user with that email already exists",
         )
 
-    hashed_password = get_password_hash(user.password)
-    query = user_table.insert().values(email=user.email, password=hashed_password)
+    hashed_password = await get_password_hash_async(user.password)
+    query = insert_user(email=user.email, password=hashed_password)
 
     logger.debug(query)
 
     await database.execute(query)
+    invalidate_user(user.email)
     return {"detail": "User created"}
 
 
@@ -0,0 +1,60 @@
+"""
+Recomputes posts.like_count and posts.comment_count from the likes and comments tables.
+Run it after importing data or whenever the counters may have drifted:
+
+    python -m src.scripts.reconcile_counters
+"""
+
+import asyncio
+import logging
+
+import sqlalchemy
+
+from src.database import comment_table, database, like_table, post_table
+
+logger = logging.getLogger(__name__)
+
+
+def set_counter_from(table: sqlalchemy.Table, counter: str):
+    # one grouped scan of the table instead of a count per post
+    counts = (
+        sqlalchemy.select(
+            table.c.post_id, sqlalchemy.func.count(table.c.id).label("count")
+        )
+        .group_by(table.c.post_id)
+        .subquery()
+    )
+    return (
+        post_table.update()
+        .where(post_table.c.id == counts.c.post_id)
+        .values({counter: counts.c.count})
+    )
+
+
+# posts without any likes/comments don't show up in the grouped counts
+reconcile_queries = [
+    post_table.update().values(like_count=0, comment_count=0),
+    set_counter_from(like_table, "like_count"),
+    set_counter_from(comment_table, "comment_count"),
+]
+
+
+async def reconcile_post_counters() -> None:
+    logger.info("Reconciling post counters")
+    async with database.transaction():
+        for query in reconcile_queries:
+            logger.debug(query)
+            await database.execute(query)
+
+
+async def main() -> None:
+    await database.connect()
+    try:
+        await reconcile_post_counters()
+    finally:
+        await database.disconnect()
+    print("Post counters reconciled")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,13 +1,23 @@
+import asyncio
 import datetime
 import logging
-from typing import Annotated, Literal
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Any, Literal
 
+import sqlalchemy
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import ExpiredSignatureError, JWTError, jwt
 from passlib.context import CryptContext
 
-from src.database import database, user_table
+from src import metrics
+from src.cache import TTLCache
+from src.config import config
+from src.database import user_table
+from src.replicas import read_database
+from src.statements import CachedStatement
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +25,38 @@ SECRET_KEY = "5456151sadsad5a1sd5asd51ac5ag56gzn"
 ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 pwd_context = CryptContext(schemes=["bcrypt"])
+# verified tokens -> (subject, type) until they expire, skips the signature check
+token_cache = TTLCache(maxsize=config.TOKEN_CACHE_SIZE, ttl=0, clock=time.time)
+# user records by token subject (email), saves a query on every authenticated request
+user_cache = TTLCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL_SECONDS)
+
+
+def register_cache_metrics(prefix: str, cache: TTLCache, entries: str) -> None:
+    metrics.registry.register(
+        metrics.CallbackCounter(
+            f"{prefix}_hits_total",
+            f"{entries} found in the cache.",
+            lambda: cache.hits,
+        )
+    )
+    metrics.registry.register(
+        metrics.CallbackCounter(
+            f"{prefix}_misses_total",
+            f"{entries} not in the cache or expired.",
+            lambda: cache.misses,
+        )
+    )
+    metrics.registry.register(
+        metrics.CallbackCounter(
+            f"{prefix}_evictions_total",
+            f"{entries} dropped from the full cache.",
+            lambda: cache.evictions,
+        )
+    )
+
+
+register_cache_metrics("auth_token_cache", token_cache, "Verified tokens")
+register_cache_metrics("auth_user_cache", user_cache, "Authenticated users")
 
 
 def create_credentials_exception(detail: str) -> HTTPException:
@@ -53,23 +95,35 @@ def create_confirmation_token(email: str):
     return encoded_jwt
 
 
-def get_subject_for_token_type(
-    token: str, type: Literal["access", "confirmation"]
-) -> str:
+def decode_token(token: str) -> tuple[str | None, str | None]:
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+
     try:
-        logger.debug("Decoding access token")
+        logger.debug("Decoding token")
         payload = jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
     except ExpiredSignatureError as err:
         raise create_credentials_exception("Token has expired") from err
     except JWTError as err:
         raise create_credentials_exception("Invalid token") from err
 
-    logger.debug(payload)
-    email = payload.get("sub")
+    claims = (payload.get("sub"), payload.get("type"))
+    logger.debug("Decoded token", extra={"token_type": claims[1]})
+    exp = payload.get("exp")
+    if isinstance(exp, int):
+        # jwt.decode accepts the token up to the last second of exp, so does the cache
+        token_cache.set(token, claims, expires_at=exp + 1)
+    return claims
+
+
+def get_subject_for_token_type(
+    token: str, type: Literal["access", "confirmation"]
+) -> str:
+    email, token_type = decode_token(token)
     if email is None:
         raise create_credentials_exception("Token is missing 'sub' field")
 
-    token_type = payload.get("type")
     if token_type is None or token_type != type:
         raise create_credentials_exception(
             f"Token has incorrect type, expected '{type}', got '{token_type}'"
@@ -86,27 +140,136 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHashPool:
+    """
+    Runs bcrypt in a thread pool so a hash doesn't block the event loop for its ~250ms.
+    At most `workers` hashes run at once and `max_queue` wait, beyond that the pool
+    rejects the request with a 503 instead of letting the backlog grow.
+    """
+
+    def __init__(self, workers: int, max_queue: int) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def queued(self) -> int:
+        return max(self.in_flight - self.workers, 0)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            logger.warning("Password hash pool is saturated, rejecting request")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again later",
+                headers={"Retry-After": "1"},
+            )
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hash"
+            )
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hash_pool = PasswordHashPool(
+    workers=config.PASSWORD_HASH_WORKERS, max_queue=config.PASSWORD_HASH_MAX_QUEUE
+)
+metrics.registry.register(
+    metrics.CallbackGauge(
+        "password_hash_pool_workers",
+        "Threads hashing passwords.",
+        lambda: password_hash_pool.workers,
+    )
+)
+metrics.registry.register(
+    metrics.CallbackGauge(
+        "password_hash_pool_in_flight",
+        "Password hashes running or waiting for a thread.",
+        lambda: password_hash_pool.in_flight,
+    )
+)
+metrics.registry.register(
+    metrics.CallbackGauge(
+        "password_hash_pool_queued",
+        "Password hashes waiting for a thread, past max_queue requests get a 503.",
+        lambda: password_hash_pool.queued,
+    )
+)
+metrics.registry.register(
+    metrics.CallbackGauge(
+        "password_hash_pool_max_queue",
+        "Password hashes that may wait for a thread.",
+        lambda: password_hash_pool.max_queue,
+    )
+)
+metrics.registry.register(
+    metrics.CallbackCounter(
+        "password_hash_pool_rejected_total",
+        "Requests rejected with a 503 because the pool was saturated.",
+        lambda: password_hash_pool.rejected,
+    )
+)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hash_pool.run(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hash_pool.run(
+        verify_password, plain_password, hashed_password
+    )
+
+
+select_user = CachedStatement(
+    user_table.select().where(user_table.c.email == sqlalchemy.bindparam("email"))
+)
+
+
 async def get_user(email: str):
     logger.debug("Fetching user from the database", extra={"email": email})
-    query = user_table.select().where(user_table.c.email == email)
-    result = await database.fetch_one(query)
+    query = select_user(email=email)
+    result = await read_database().fetch_one(query)
     if result:
         return result
 
 
+def invalidate_user(email: str) -> None:
+    # call whenever a user record is created or changed (e.g. password change)
+    logger.debug("Invalidating cached user", extra={"email": email})
+    user_cache.delete(email)
+
+
 async def authenticate_user(email: str, password: str):
     logger.debug("Authenticating user", extra={"email": email})
     user = await get_user(email)
     if not user:
         raise create_credentials_exception("Invalid email or password")
-    if not verify_password(password, user.password):
+    if not await verify_password_async(password, user.password):
         raise create_credentials_exception("Invalid email or password")
     return user
 
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     email = get_subject_for_token_type(token, type="access")
-    user = await get_user(email=email)
+    user = user_cache.get(email)
     if user is None:
-        raise create_credentials_exception("Could not find user for this token")
+        user = await get_user(email=email)
+        if user is None:
+            raise create_credentials_exception("Could not find user for this token")
+        user_cache.set(email, user)
     return user
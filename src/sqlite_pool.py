@@ -0,0 +1,292 @@
+"""
+SQLite backends for `databases`.
+
+`SQLiteDatabase` is the stock backend with one change: a transaction starts
+with BEGIN IMMEDIATE, so it takes the write lock up front. With the stock
+deferred BEGIN two transactions can both hold a read lock and then both need
+the write lock - SQLite fails one of them with "database is locked" at once
+instead of waiting, as waiting would deadlock. Triggers that read before they
+write, like the full-text index ones, make that the common case.
+
+`PooledSQLiteDatabase` is a production profile. The stock SQLite backend
+opens a new aiosqlite connection for every task and leaves SQLite in its
+default rollback-journal mode, where a writer blocks all readers. This backend
+instead keeps its connections open and applies WAL journaling plus the other
+pragmas to each of them when it is opened:
+
+- one writer connection, used by INSERT/UPDATE/DELETE/DDL statements and by
+  every transaction, one task at a time
+- a pool of up to `readers` connections for SELECTs, which in WAL mode read
+  a consistent snapshot while the writer is busy
+
+It only makes sense for a database file - every connection to ":memory:" is
+a separate empty database.
+"""
+
+import asyncio
+import contextlib
+import logging
+import typing
+from collections.abc import AsyncIterator
+
+import aiosqlite
+import databases
+from databases.backends.sqlite import (
+    SQLiteBackend,
+    SQLiteConnection,
+    SQLiteTransaction,
+)
+from databases.core import DatabaseURL
+from sqlalchemy.sql import ClauseElement
+
+logger = logging.getLogger(__name__)
+
+
+def production_pragmas(
+    mmap_size: int, cache_size: int, busy_timeout: int
+) -> dict[str, typing.Any]:
+    return {
+        "journal_mode": "WAL",
+        # with WAL a commit is durable once the WAL is checkpointed, not on every commit
+        "synchronous": "NORMAL",
+        "mmap_size": mmap_size,
+        # negative is KiB, positive is pages
+        "cache_size": cache_size,
+        # wait for a lock held by another process instead of failing with SQLITE_BUSY
+        "busy_timeout": busy_timeout,
+        "temp_store": "MEMORY",
+    }
+
+
+class ImmediateSQLiteTransaction(SQLiteTransaction):
+    async def start(self, is_root: bool, extra_options: dict) -> None:
+        if not is_root:
+            await super().start(is_root, extra_options)
+            return
+        self._is_root = True
+        # takes the write lock now, instead of failing to upgrade a read lock later
+        async with self._connection._connection.execute("BEGIN IMMEDIATE") as cursor:
+            await cursor.close()
+
+
+class ImmediateSQLiteConnection(SQLiteConnection):
+    def transaction(self) -> ImmediateSQLiteTransaction:
+        return ImmediateSQLiteTransaction(self)
+
+
+class ImmediateSQLiteBackend(SQLiteBackend):
+    def connection(self) -> ImmediateSQLiteConnection:
+        return ImmediateSQLiteConnection(self._pool, self._dialect)
+
+
+class SQLiteDatabase(databases.Database):
+    """databases.Database that runs sqlite:// URLs on ImmediateSQLiteBackend."""
+
+    SUPPORTED_BACKENDS: typing.ClassVar[dict[str, str]] = {
+        **databases.Database.SUPPORTED_BACKENDS,
+        "sqlite": "src.sqlite_pool:ImmediateSQLiteBackend",
+    }
+
+
+class SQLiteConnectionPool:
+    def __init__(self, url: DatabaseURL, readers: int, pragmas: dict[str, typing.Any]):
+        self.database = url.database
+        self.readers = readers
+        self.pragmas = pragmas
+        self.writer: aiosqlite.Connection | None = None
+        self.write_lock: asyncio.Lock | None = None
+        self.idle: asyncio.LifoQueue | None = None
+        self.opened: list[aiosqlite.Connection] = []
+
+    async def open_connection(self, query_only: bool = False) -> aiosqlite.Connection:
+        connection = await aiosqlite.connect(self.database, isolation_level=None)
+        for name, value in self.pragmas.items():
+            await connection.execute(f"PRAGMA {name}={value}")
+        if query_only:
+            await connection.execute("PRAGMA query_only=ON")
+        self.opened.append(connection)
+        return connection
+
+    async def connect(self) -> None:
+        # the writer is opened first so it switches the file to WAL before any reader
+        self.writer = await self.open_connection()
+        self.write_lock = asyncio.Lock()
+        # readers are opened on first use, None marks a free slot
+        self.idle = asyncio.LifoQueue()
+        for _ in range(self.readers):
+            self.idle.put_nowait(None)
+        logger.debug("Opened %s with up to %d readers", self.database, self.readers)
+
+    async def disconnect(self) -> None:
+        for connection in self.opened:
+            await connection.close()
+        self.opened.clear()
+        self.writer = self.write_lock = self.idle = None
+
+    @contextlib.asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        assert self.idle is not None, "Pool is not connected"
+        connection = await self.idle.get()
+        try:
+            if connection is None:
+                connection = await self.open_connection(query_only=True)
+            yield connection
+        finally:
+            self.idle.put_nowait(connection)
+
+    async def acquire_writer(self) -> aiosqlite.Connection:
+        assert self.write_lock is not None, "Pool is not connected"
+        await self.write_lock.acquire()
+        return self.writer
+
+    def release_writer(self) -> None:
+        self.write_lock.release()
+
+
+class PooledSQLiteConnection(SQLiteConnection):
+    """
+    Borrows a connection from the pool for every statement, or holds the writer
+    for the whole of a transaction.
+    """
+
+    def __init__(self, pool: SQLiteConnectionPool, dialect):
+        super().__init__(pool, dialect)
+        self._in_transaction = False
+
+    async def acquire(self) -> None:
+        pass
+
+    async def release(self) -> None:
+        if self._in_transaction:
+            # a transaction left open must not keep the writer locked
+            self._in_transaction = False
+            await self._connection.execute("ROLLBACK")
+            self._pool.release_writer()
+        self._connection = None
+
+    @contextlib.asynccontextmanager
+    async def _using(self, query: ClauseElement) -> AsyncIterator[None]:
+        if self._in_transaction:
+            yield
+        elif query.is_select:
+            async with self._pool.reader() as connection:
+                self._connection = connection
+                try:
+                    yield
+                finally:
+                    self._connection = None
+        else:
+            self._connection = await self._pool.acquire_writer()
+            try:
+                yield
+            finally:
+                self._connection = None
+                self._pool.release_writer()
+
+    async def begin(self) -> None:
+        self._connection = await self._pool.acquire_writer()
+        self._in_transaction = True
+
+    def end(self) -> None:
+        self._in_transaction = False
+        self._connection = None
+        self._pool.release_writer()
+
+    async def fetch_all(self, query: ClauseElement):
+        async with self._using(query):
+            return await super().fetch_all(query)
+
+    async def fetch_one(self, query: ClauseElement):
+        async with self._using(query):
+            return await super().fetch_one(query)
+
+    async def execute(self, query: ClauseElement):
+        async with self._using(query):
+            return await super().execute(query)
+
+    async def iterate(self, query: ClauseElement):
+        async with self._using(query):
+            async for record in super().iterate(query):
+                yield record
+
+    def transaction(self) -> "PooledSQLiteTransaction":
+        return PooledSQLiteTransaction(self)
+
+    @property
+    def raw_connection(self) -> aiosqlite.Connection:
+        assert self._in_transaction, "Only available inside a transaction"
+        return self._connection
+
+
+class PooledSQLiteTransaction(ImmediateSQLiteTransaction):
+    _connection: PooledSQLiteConnection
+
+    async def start(self, is_root: bool, extra_options: dict) -> None:
+        if not is_root:
+            await super().start(is_root, extra_options)
+            return
+        await self._connection.begin()
+        try:
+            await super().start(is_root, extra_options)
+        except BaseException:
+            self._connection.end()
+            raise
+
+    async def commit(self) -> None:
+        try:
+            await super().commit()
+        finally:
+            if self._is_root:
+                self._connection.end()
+
+    async def rollback(self) -> None:
+        try:
+            await super().rollback()
+        finally:
+            if self._is_root:
+                self._connection.end()
+
+
+class PooledSQLiteBackend(SQLiteBackend):
+    def __init__(
+        self,
+        database_url: DatabaseURL | str,
+        readers: int = 4,
+        pragmas: dict[str, typing.Any] | None = None,
+    ) -> None:
+        super().__init__(database_url)
+        self._pool = SQLiteConnectionPool(self._database_url, readers, pragmas or {})
+
+    async def connect(self) -> None:
+        await self._pool.connect()
+
+    async def disconnect(self) -> None:
+        await self._pool.disconnect()
+
+    def connection(self) -> PooledSQLiteConnection:
+        return PooledSQLiteConnection(self._pool, self._dialect)
+
+
+class PooledSQLiteDatabase(databases.Database):
+    """databases.Database that runs sqlite:// URLs on PooledSQLiteBackend."""
+
+    SUPPORTED_BACKENDS: typing.ClassVar[dict[str, str]] = {
+        **databases.Database.SUPPORTED_BACKENDS,
+        "sqlite": "src.sqlite_pool:PooledSQLiteBackend",
+    }
+
+    async def iterate(
+        self, query: ClauseElement | str, values: dict | None = None
+    ) -> AsyncIterator[typing.Any]:
+        # databases wraps iterate() in a transaction, which here would hold the
+        # writer for as long as the rows are streamed - a SELECT reads a snapshot
+        # on a reader connection without one
+        if not getattr(query, "is_select", False):
+            async for record in super().iterate(query, values):
+                yield record
+            return
+        async with self.connection() as connection:
+            built_query = connection._build_query(query, values)
+            async with connection._query_lock:
+                async for record in connection._connection.iterate(built_query):
+                    yield record
@@ -0,0 +1,92 @@
+"""
+Compiled statement cache.
+
+`databases` compiles every query it is given to SQL, and most handlers build
+the same query shape with only the values changing. A `CachedStatement` holds
+one such shape with `sqlalchemy.bindparam()` placeholders and compiles it once
+per dialect; calling it binds the values of one execution:
+
+    find_post = CachedStatement(
+        post_table.select().where(post_table.c.id == sqlalchemy.bindparam("post_id"))
+    )
+    await database.fetch_one(find_post(post_id=1))
+
+Only for fixed shapes - a query built from a list (IN) or with optional
+clauses compiles to different SQL for different values, so it needs one
+statement per variant or no caching at all.
+"""
+
+from functools import cached_property
+from typing import Any
+
+from sqlalchemy.engine import Dialect
+from sqlalchemy.sql import ClauseElement
+from sqlalchemy.sql.compiler import Compiled
+
+
+class BoundCompiled:
+    """The cached Compiled, handing out the values of one execution as its params."""
+
+    def __init__(self, compiled: Compiled, values: dict[str, Any]) -> None:
+        self._compiled = compiled
+        self._values = values
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._compiled, name)
+
+    def construct_params(self, *args, **kwargs) -> dict[str, Any]:
+        return self._compiled.construct_params(self._values, *args, **kwargs)
+
+    @property
+    def params(self) -> dict[str, Any]:
+        return self.construct_params()
+
+
+class BoundStatement:
+    def __init__(self, statement: "CachedStatement", values: dict[str, Any]) -> None:
+        self.statement = statement
+        self.values = values
+
+    @property
+    def is_select(self) -> bool:
+        return self.statement.query.is_select
+
+    def compile(self, dialect: Dialect, compile_kwargs: dict | None = None):
+        return BoundCompiled(
+            self.statement.compiled(dialect, compile_kwargs), self.values
+        )
+
+    def __str__(self) -> str:
+        return self.statement.sql
+
+
+class CachedStatement:
+    def __init__(self, query: ClauseElement) -> None:
+        self.query = query
+        self._compiled: dict[tuple, Compiled] = {}
+        self.compilations = 0
+
+    def __call__(self, **values: Any) -> BoundStatement:
+        return BoundStatement(self, values)
+
+    def compiled(
+        self, dialect: Dialect, compile_kwargs: dict | None = None
+    ) -> Compiled:
+        key = (
+            type(dialect),
+            dialect.paramstyle,
+            tuple(sorted((compile_kwargs or {}).items())),
+        )
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self.query.compile(
+                dialect=dialect, compile_kwargs=compile_kwargs or {}
+            )
+            self._compiled[key] = compiled
+            self.compilations += 1
+        return compiled
+
+    @cached_property
+    def sql(self) -> str:
+        # what logger.debug(query) prints, without compiling on every call
+        return str(self.query)
@@ -6,8 +6,17 @@ from fastapi.testclient import TestClient
 from httpx import ASGITransport, AsyncClient
 
 os.environ["ENV_STATE"] = "test"
-from src.database import database, user_table  # noqa: E402
+from src.database import (  # noqa: E402
+    comment_table,
+    database,
+    like_table,
+    post_table,
+    user_table,
+)
 from src.main import app  # noqa: E402
+from src.migrations import migrate  # noqa: E402
+from src.response_cache import response_cache  # noqa: E402
+from src.security import token_cache, user_cache  # noqa: E402
 
 
 @pytest.fixture(scope="session")
@@ -15,6 +24,11 @@ def anyio_backend():
     return "asyncio"
 
 
+@pytest.fixture(scope="session", autouse=True)
+def schema() -> None:
+    migrate()
+
+
 @pytest.fixture(autouse=True)
 def client() -> Generator:
     yield TestClient(app)
@@ -23,8 +37,18 @@ def client() -> Generator:
 @pytest.fixture(autouse=True)
 async def db() -> AsyncGenerator:
     await database.connect()
+    if database.url.dialect == "postgresql":
+        # sequences are not rolled back with the test, so each test starts from id 1;
+        # TRUNCATE ... RESTART IDENTITY itself is undone with the rest of the test
+        tables = [post_table, user_table, comment_table, like_table]
+        names = ", ".join(table.name for table in tables)
+        await database.execute(f"TRUNCATE {names} RESTART IDENTITY CASCADE")
     yield
     await database.disconnect()
+    # the rolled back rows must not outlive the test in a cache
+    user_cache.clear()
+    token_cache.clear()
+    response_cache.backend.clear()
 
 
 @pytest.fixture()
@@ -48,3 +72,13 @@ async def registered_user(async_client: AsyncClient) -> dict:
 async def logged_in_token(async_client: AsyncClient, registered_user: dict) -> str:
     response = await async_client.post("/token", json=registered_user)
     return response.json()["access_token"]
+
+
+@pytest.fixture()
+async def created_post(async_client: AsyncClient, logged_in_token: str) -> dict:
+    response = await async_client.post(
+        "/post",
+        json={"body": "Test Post"},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    return response.json()
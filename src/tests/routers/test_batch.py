@@ -0,0 +1,79 @@
+import pytest
+from httpx import AsyncClient
+
+from src.tests.routers.test_post import create_post, like_post
+
+
+async def post_batch(
+    path: str, items: list, async_client: AsyncClient, logged_in_token: str
+):
+    return await async_client.post(
+        path, json=items, headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+
+
+@pytest.mark.anyio
+async def test_create_posts(
+    async_client: AsyncClient, registered_user: dict, logged_in_token: str
+):
+    items = [{"body": "Post 1"}, {"wrong": "field"}, {"body": "Post 2"}]
+    response = await post_batch("/post/batch", items, async_client, logged_in_token)
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["id"] for result in results] == [1, None, 2]
+    assert results[1]["error"] == "body: Field required"
+
+    posts = (await async_client.get("/post", params={"sorting": "old"})).json()
+    assert posts == [
+        {"id": 1, "body": "Post 1", "user_id": registered_user["id"], "likes": 0},
+        {"id": 2, "body": "Post 2", "user_id": registered_user["id"], "likes": 0},
+    ]
+
+
+@pytest.mark.anyio
+async def test_create_comments(async_client: AsyncClient, logged_in_token: str):
+    post = await create_post("Test Post", async_client, logged_in_token)
+    items = [
+        {"body": "Comment 1", "post_id": post["id"]},
+        {"body": "Comment 2", "post_id": 99},
+        {"body": "Comment 3", "post_id": post["id"]},
+    ]
+    response = await post_batch("/comment/batch", items, async_client, logged_in_token)
+
+    results = response.json()
+    assert [result["id"] for result in results] == [1, None, 2]
+    assert results[1]["error"] == "Post not found"
+
+    comments = (await async_client.get(f"/post/{post['id']}/comment")).json()
+    assert [comment["body"] for comment in comments] == ["Comment 1", "Comment 3"]
+
+
+@pytest.mark.anyio
+async def test_like_posts(async_client: AsyncClient, logged_in_token: str):
+    first = await create_post("Test Post 1", async_client, logged_in_token)
+    second = await create_post("Test Post 2", async_client, logged_in_token)
+    existing = await like_post(first["id"], async_client, logged_in_token)
+
+    items = [
+        {"post_id": first["id"]},
+        {"post_id": second["id"]},
+        {"post_id": 99},
+        {"post_id": second["id"]},
+    ]
+    response = await post_batch("/like/batch", items, async_client, logged_in_token)
+
+    results = response.json()
+    assert results[0]["id"] == existing["id"]
+    assert results[1]["id"] == results[3]["id"] is not None
+    assert results[2] == {"id": None, "error": "Post not found"}
+
+    posts = (await async_client.get("/post", params={"sorting": "old"})).json()
+    assert [post["likes"] for post in posts] == [1, 1]
+
+
+@pytest.mark.anyio
+async def test_batch_too_large(async_client: AsyncClient, logged_in_token: str):
+    items = [{"body": "Post"}] * 501
+    response = await post_batch("/post/batch", items, async_client, logged_in_token)
+    assert response.status_code == 422
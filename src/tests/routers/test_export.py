@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from src.routers import export
+from src.tests.routers.test_post import create_comment, create_post, like_post
+
+
+def ndjson(response) -> list[dict]:
+    assert response.headers["content-type"] == export.NDJSON
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.fixture()
+async def created_posts(async_client: AsyncClient, logged_in_token: str) -> list:
+    posts = [
+        await create_post(f"Post {i}", async_client, logged_in_token) for i in range(3)
+    ]
+    await like_post(posts[0]["id"], async_client, logged_in_token)
+    for post in posts[:2]:
+        await create_comment("Comment", post["id"], async_client, logged_in_token)
+    return posts
+
+
+@pytest.mark.anyio
+async def test_export_posts(
+    async_client: AsyncClient, logged_in_token: str, created_posts: list
+):
+    response = await async_client.get(
+        "/export/posts", headers={"Authorization": f"Bearer {logged_in_token}"}
+    )
+
+    assert response.status_code == 200
+    assert ndjson(response) == [
+        {**post, "likes": 1 if i == 0 else 0} for i, post in enumerate(created_posts)
+    ]
+
+
+@pytest.mark.anyio
+async def test_export_posts_since_id(
+    async_client: AsyncClient, logged_in_token: str, created_posts: list
+):
+    first, second, _ = created_posts
+    response = await async_client.get(
+        "/export/posts",
+        params={"since_id": first["id"], "max_id": second["id"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert [post["id"] for post in ndjson(response)] == [second["id"]]
+
+
+@pytest.mark.anyio
+async def test_export_posts_by_user(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    registered_user: dict,
+    created_posts: list,
+):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    response = await async_client.get(
+        "/export/posts", params={"user_id": registered_user["id"]}, headers=headers
+    )
+    assert len(ndjson(response)) == 3
+
+    response = await async_client.get(
+        "/export/posts", params={"user_id": registered_user["id"] + 1}, headers=headers
+    )
+    assert response.text == ""
+
+
+@pytest.mark.anyio
+async def test_export_comments(
+    async_client: AsyncClient, logged_in_token: str, created_posts: list
+):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    response = await async_client.get("/export/comments", headers=headers)
+    comments = ndjson(response)
+    assert [comment["post_id"] for comment in comments] == [
+        post["id"] for post in created_posts[:2]
+    ]
+    assert set(comments[0]) == {"id", "body", "post_id", "user_id"}
+
+    response = await async_client.get(
+        "/export/comments",
+        params={"post_id": created_posts[1]["id"]},
+        headers=headers,
+    )
+    assert [comment["post_id"] for comment in ndjson(response)] == [
+        created_posts[1]["id"]
+    ]
+
+
+@pytest.mark.anyio
+async def test_export_streams_in_chunks(created_posts: list, mocker):
+    mocker.patch.object(export, "EXPORT_CHUNK_BYTES", 1)
+    query = export.ExportFilters().apply(
+        export.select_post_and_likes, export.post_table
+    )
+
+    # every line fills a chunk, so each goes out on its own
+    chunks = [chunk async for chunk in export.ndjson_lines(query, export.post_table)]
+    assert [json.loads(chunk)["id"] for chunk in chunks] == [
+        post["id"] for post in created_posts
+    ]
+
+
+@pytest.mark.anyio
+async def test_export_does_not_block_writes(
+    async_client: AsyncClient, logged_in_token: str, created_posts: list, mocker
+):
+    mocker.patch.object(export, "EXPORT_CHUNK_BYTES", 1)
+    mocker.patch.object(export, "EXPORT_PAGE_ROWS", 1)
+    query = export.ExportFilters().apply(
+        export.select_post_and_likes, export.post_table
+    )
+    lines = export.ndjson_lines(query, export.post_table)
+
+    try:
+        # a client that has read the first line and not the rest yet
+        first = json.loads(await anext(lines))
+        # another request, which gets a connection of its own
+        written = await asyncio.wait_for(
+            asyncio.create_task(
+                create_post("Meanwhile", async_client, logged_in_token)
+            ),
+            timeout=2,
+        )
+        rest = [json.loads(chunk) async for chunk in lines]
+    finally:
+        await lines.aclose()
+
+    assert written["body"] == "Meanwhile"
+    assert [first["id"]] + [post["id"] for post in rest] == [
+        post["id"] for post in created_posts
+    ] + [written["id"]]
+
+
+@pytest.mark.anyio
+async def test_export_requires_login(async_client: AsyncClient):
+    response = await async_client.get("/export/posts")
+
+    assert response.status_code == 401
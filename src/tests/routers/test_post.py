@@ -46,11 +46,6 @@ async def like_post(
     return response.json()
 
 
-@pytest.fixture()
-async def created_post(async_client: AsyncClient, logged_in_token: str):
-    return await create_post("Test Post", async_client, logged_in_token)
-
-
 @pytest.fixture()
 async def created_comment(
     async_client: AsyncClient, created_post: dict, logged_in_token: str
@@ -298,3 +293,155 @@ async def test_get_missing_post_with_comments(
     assert "detail" in response_data
     assert response_data["detail"] == "Post not found"
     assert isinstance(response_data["detail"], str)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "sorting, expected_pages",
+    [
+        ("new", [[3, 2], [1]]),
+        ("old", [[1, 2], [3]]),
+    ],
+)
+async def test_get_all_posts_pagination(
+    async_client: AsyncClient,
+    logged_in_token: str,
+    sorting: str,
+    expected_pages: list[list[int]],
+):
+    for i in range(3):
+        await create_post(f"Test Post {i}", async_client, logged_in_token)
+
+    response = await async_client.get("/post", params={"sorting": sorting, "limit": 2})
+    assert response.status_code == 200
+    assert [post["id"] for post in response.json()] == expected_pages[0]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await async_client.get(
+        "/post", params={"sorting": sorting, "limit": 2, "cursor": cursor}
+    )
+    assert response.status_code == 200
+    assert [post["id"] for post in response.json()] == expected_pages[1]
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_pagination_most_likes(
+    async_client: AsyncClient, logged_in_token: str
+):
+    for i in range(4):
+        await create_post(f"Test Post {i}", async_client, logged_in_token)
+    await like_post(2, async_client, logged_in_token)
+    await like_post(3, async_client, logged_in_token)
+
+    post_ids = []
+    cursor = None
+    while True:
+        params = {"sorting": "most_likes", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        response = await async_client.get("/post", params=params)
+        post_ids += [post["id"] for post in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    # posts with equal likes keep a stable order by id
+    assert post_ids == [3, 2, 4, 1]
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get("/post", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.anyio
+async def test_like_post_twice(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    like = await like_post(created_post["id"], async_client, logged_in_token)
+    response = await async_client.post(
+        "/like",
+        json={"post_id": created_post["id"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == like
+
+    response = await async_client.get(f"/post/{created_post['id']}")
+    assert response.json()["post"]["likes"] == 1
+
+
+@pytest.mark.anyio
+async def test_like_missing_post(async_client: AsyncClient, logged_in_token: str):
+    response = await async_client.post(
+        "/like",
+        json={"post_id": 2},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Post not found"
+
+
+@pytest.mark.anyio
+async def test_unlike_post(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await like_post(created_post["id"], async_client, logged_in_token)
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+
+    response = await async_client.delete(f"/like/{created_post['id']}", headers=headers)
+    assert response.status_code == 204
+
+    response = await async_client.get(f"/post/{created_post['id']}")
+    assert response.json()["post"]["likes"] == 0
+
+    response = await async_client.delete(f"/like/{created_post['id']}", headers=headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Like not found"
+
+
+@pytest.mark.anyio
+async def test_get_all_posts_include_comments(
+    async_client: AsyncClient, logged_in_token: str
+):
+    first = await create_post("Test Post 1", async_client, logged_in_token)
+    second = await create_post("Test Post 2", async_client, logged_in_token)
+    comments = [
+        await create_comment(f"Comment {i}", first["id"], async_client, logged_in_token)
+        for i in range(3)
+    ]
+
+    response = await async_client.get("/post", params={"include_comments": 2})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"post": {**second, "likes": 0}, "comments": []},
+        {"post": {**first, "likes": 0}, "comments": comments[:2]},
+    ]
+
+
+@pytest.mark.anyio
+async def test_get_post_with_comments_limit(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    comments = [
+        await create_comment(
+            f"Comment {i}", created_post["id"], async_client, logged_in_token
+        )
+        for i in range(3)
+    ]
+    await like_post(created_post["id"], async_client, logged_in_token)
+
+    response = await async_client.get(
+        f"/post/{created_post['id']}", params={"comment_limit": 2}
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "post": {**created_post, "likes": 1},
+        "comments": comments[:2],
+    }
+
+    response = await async_client.get(f"/post/{created_post['id']}")
+    assert response.json()["comments"] == comments
@@ -0,0 +1,140 @@
+import pytest
+from httpx import AsyncClient
+
+from src.routers import search as search_router
+from src.routers.search import match_query
+from src.tests.routers.test_post import create_comment, create_post
+
+
+async def search(async_client: AsyncClient, q: str, **params):
+    return await async_client.get("/search", params={"q": q, **params})
+
+
+def found(response) -> list[tuple[str, str]]:
+    assert response.status_code == 200
+    return [(result["kind"], result["body"]) for result in response.json()]
+
+
+@pytest.mark.parametrize(
+    "q, dialect, expected",
+    [
+        ("fast api", "sqlite", '"fast" "api"'),
+        ('fas* "OR" -x', "sqlite", '"fas"* "OR" "x"'),
+        ("fast api", "postgresql", "fast & api"),
+        ("fas* | !x", "postgresql", "fas:* & x"),
+    ],
+)
+def test_match_query(q: str, dialect: str, expected: str):
+    assert match_query(q, dialect) == expected
+
+
+@pytest.mark.anyio
+async def test_search_posts_and_comments(
+    async_client: AsyncClient, logged_in_token: str
+):
+    post = await create_post("FastAPI is fast", async_client, logged_in_token)
+    await create_post("Slow and steady", async_client, logged_in_token)
+    await create_comment("Fast reply", post["id"], async_client, logged_in_token)
+
+    response = await search(async_client, "FAST")
+
+    assert sorted(found(response)) == [
+        ("comment", "Fast reply"),
+        ("post", "FastAPI is fast"),
+    ]
+    comment = next(r for r in response.json() if r["kind"] == "comment")
+    assert comment["post_id"] == post["id"]
+
+
+@pytest.mark.anyio
+async def test_search_ranks_best_match_first(
+    async_client: AsyncClient, logged_in_token: str
+):
+    await create_post("fast and then many other words", async_client, logged_in_token)
+    await create_post("fast fast fast", async_client, logged_in_token)
+
+    response = await search(async_client, "fast")
+
+    assert found(response) == [
+        ("post", "fast fast fast"),
+        ("post", "fast and then many other words"),
+    ]
+
+
+@pytest.fixture()
+def two_ranked_matches(monkeypatch):
+    # the cap is part of the cached statement
+    monkeypatch.setattr(search_router, "MAX_RANKED_MATCHES", 2)
+    search_router.select_search_page.cache_clear()
+    yield
+    search_router.select_search_page.cache_clear()
+
+
+@pytest.mark.anyio
+async def test_search_ranks_newest_matches(
+    async_client: AsyncClient, logged_in_token: str, two_ranked_matches
+):
+    await create_post("fast fast fast", async_client, logged_in_token)
+    await create_post("fast and slow", async_client, logged_in_token)
+    await create_post("fast or slow", async_client, logged_in_token)
+
+    response = await search(async_client, "fast", kind="posts")
+
+    assert sorted(found(response)) == [
+        ("post", "fast and slow"),
+        ("post", "fast or slow"),
+    ]
+
+
+@pytest.mark.anyio
+async def test_search_prefix_and_all_words(
+    async_client: AsyncClient, logged_in_token: str
+):
+    await create_post("faster horses", async_client, logged_in_token)
+    await create_post("faster cars", async_client, logged_in_token)
+
+    assert found(await search(async_client, "fast")) == []
+    assert len(found(await search(async_client, "fast*"))) == 2
+    assert found(await search(async_client, "fast* hors*")) == [
+        ("post", "faster horses")
+    ]
+
+
+@pytest.mark.anyio
+async def test_search_kind(async_client: AsyncClient, logged_in_token: str):
+    post = await create_post("Topic", async_client, logged_in_token)
+    await create_comment("Topic", post["id"], async_client, logged_in_token)
+
+    assert found(await search(async_client, "topic", kind="comments")) == [
+        ("comment", "Topic")
+    ]
+    assert found(await search(async_client, "topic", kind="posts")) == [
+        ("post", "Topic")
+    ]
+
+
+@pytest.mark.anyio
+async def test_search_pagination(async_client: AsyncClient, logged_in_token: str):
+    for i in range(3):
+        await create_post(f"Page {i}", async_client, logged_in_token)
+
+    first = await search(async_client, "page", limit=2)
+    second = await search(
+        async_client, "page", limit=2, offset=first.headers["X-Next-Offset"]
+    )
+
+    assert len(found(first)) == 2
+    assert len(found(second)) == 1
+    assert "X-Next-Offset" not in second.headers
+    assert {body for _, body in found(first) + found(second)} == {
+        "Page 0",
+        "Page 1",
+        "Page 2",
+    }
+
+
+@pytest.mark.anyio
+async def test_search_without_words(async_client: AsyncClient):
+    response = await search(async_client, '"*"')
+
+    assert response.status_code == 400
@@ -1,6 +1,11 @@
+import asyncio
+import threading
+
 import pytest
 from httpx import AsyncClient
 
+from src import security
+
 
 async def register_user(async_client: AsyncClient, email: str, password: str):
     return await async_client.post(
@@ -58,3 +63,42 @@ async def test_login_user(async_client: AsyncClient, registered_user: dict):
     assert response_data["token_type"] == "bearer"
     assert isinstance(response_data["access_token"], str)
     assert len(response_data["access_token"]) > 0
+
+
+@pytest.mark.anyio
+async def test_register_user_pool_saturated(async_client: AsyncClient, mocker):
+    pool = security.password_hash_pool
+    mocker.patch.object(pool, "in_flight", pool.workers + pool.max_queue)
+    response = await register_user(async_client, "test@example.net", "1234")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.anyio
+async def test_login_verifies_password_off_the_event_loop(
+    async_client: AsyncClient, registered_user: dict, mocker
+):
+    started = threading.Event()
+    unblocked = threading.Event()
+    threads = []
+    verify_password = security.verify_password
+
+    def blocked_verify_password(plain_password: str, hashed_password: str) -> bool:
+        threads.append(threading.current_thread().name)
+        started.set()
+        unblocked.wait(timeout=5)
+        return verify_password(plain_password, hashed_password)
+
+    mocker.patch.object(security, "verify_password", blocked_verify_password)
+    login = asyncio.create_task(async_client.post("/token", json=registered_user))
+    await asyncio.to_thread(started.wait, 5)
+    try:
+        # a hash on the event loop would hold this request until it's released
+        response = await async_client.get("/post")
+        assert response.status_code == 200
+        assert not login.done()
+    finally:
+        unblocked.set()
+
+    assert (await login).status_code == 200
+    assert threads[0].startswith("password-hash")
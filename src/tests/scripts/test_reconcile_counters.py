@@ -0,0 +1,36 @@
+import pytest
+from httpx import AsyncClient
+
+from src.database import database, post_table
+from src.scripts.reconcile_counters import reconcile_post_counters
+from src.tests.routers.test_post import create_comment, create_post, like_post
+
+
+async def get_counters(post_id: int) -> tuple[int, int]:
+    query = post_table.select().where(post_table.c.id == post_id)
+    post = await database.fetch_one(query)
+    return post.like_count, post.comment_count
+
+
+@pytest.mark.anyio
+async def test_counters_follow_writes(async_client: AsyncClient, logged_in_token: str):
+    post = await create_post("Test Post", async_client, logged_in_token)
+    await like_post(post["id"], async_client, logged_in_token)
+    await create_comment("Test Comment", post["id"], async_client, logged_in_token)
+    await create_comment("Test Comment", post["id"], async_client, logged_in_token)
+
+    assert await get_counters(post["id"]) == (1, 2)
+
+
+@pytest.mark.anyio
+async def test_reconcile_post_counters(async_client: AsyncClient, logged_in_token: str):
+    post = await create_post("Test Post", async_client, logged_in_token)
+    empty_post = await create_post("Test Post", async_client, logged_in_token)
+    await like_post(post["id"], async_client, logged_in_token)
+    await create_comment("Test Comment", post["id"], async_client, logged_in_token)
+
+    await database.execute(post_table.update().values(like_count=7, comment_count=7))
+    await reconcile_post_counters()
+
+    assert await get_counters(post["id"]) == (1, 1)
+    assert await get_counters(empty_post["id"]) == (0, 0)
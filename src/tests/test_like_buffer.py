@@ -0,0 +1,224 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from src import main
+from src.database import database, like_table, post_table
+from src.like_buffer import LikeBuffer
+
+
+@pytest.fixture()
+def buffer(mocker) -> LikeBuffer:
+    buffer = LikeBuffer(max_size=100, flush_interval=60)
+    mocker.patch("src.routers.post.like_buffer", buffer)
+    return buffer
+
+
+async def count_likes(post_id: int) -> tuple[int, int]:
+    likes = await database.fetch_all(
+        like_table.select().where(like_table.c.post_id == post_id)
+    )
+    post = await database.fetch_one(
+        post_table.select().where(post_table.c.id == post_id)
+    )
+    return len(likes), post.like_count
+
+
+@pytest.mark.anyio
+async def test_like_is_accepted_and_written_on_flush(
+    async_client: AsyncClient,
+    created_post: dict,
+    registered_user: dict,
+    logged_in_token: str,
+    buffer: LikeBuffer,
+):
+    for _ in range(3):
+        response = await async_client.post(
+            "/like",
+            json={"post_id": created_post["id"]},
+            headers={"Authorization": f"Bearer {logged_in_token}"},
+        )
+        assert response.status_code == 202
+        assert response.json() == {
+            "post_id": created_post["id"],
+            "user_id": registered_user["id"],
+        }
+
+    # repeated likes are coalesced in memory, nothing is written yet
+    assert len(buffer.pending) == 1
+    assert await count_likes(created_post["id"]) == (0, 0)
+
+    assert await buffer.flush() == 1
+    assert await count_likes(created_post["id"]) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_flush_skips_existing_likes_and_missing_posts(
+    created_post: dict, registered_user: dict
+):
+    buffer = LikeBuffer(max_size=100, flush_interval=60)
+    buffer.add(created_post["id"], registered_user["id"])
+    await buffer.flush()
+
+    buffer.add(created_post["id"], registered_user["id"])
+    buffer.add(created_post["id"] + 1, registered_user["id"])
+    assert await buffer.flush() == 0
+
+    assert not buffer.pending
+    assert await count_likes(created_post["id"]) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_flush_when_full(created_post: dict, registered_user: dict):
+    buffer = LikeBuffer(max_size=1, flush_interval=60)
+    buffer.start()
+    try:
+        buffer.add(created_post["id"], registered_user["id"])
+        for _ in range(100):
+            if buffer.flushed:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await buffer.stop()
+
+    assert buffer.flushed == 1
+    assert await count_likes(created_post["id"]) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_stop_drains_pending_likes(created_post: dict, registered_user: dict):
+    buffer = LikeBuffer(max_size=100, flush_interval=60)
+    buffer.start()
+    buffer.add(created_post["id"], registered_user["id"])
+
+    await buffer.stop()
+
+    assert not buffer.pending
+    assert await count_likes(created_post["id"]) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_failed_flush_keeps_likes(
+    mocker, created_post: dict, registered_user: dict
+):
+    buffer = LikeBuffer(max_size=100, flush_interval=60)
+    buffer.add(created_post["id"], registered_user["id"])
+
+    mocker.patch("src.like_buffer.database.fetch_all", side_effect=RuntimeError)
+    with pytest.raises(RuntimeError):
+        await buffer.flush()
+    assert (created_post["id"], registered_user["id"]) in buffer.pending
+
+    mocker.stopall()
+    assert await buffer.flush() == 1
+
+
+@pytest.mark.anyio
+async def test_unlike_pending_like(
+    async_client: AsyncClient,
+    created_post: dict,
+    logged_in_token: str,
+    buffer: LikeBuffer,
+):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    await async_client.post(
+        "/like", json={"post_id": created_post["id"]}, headers=headers
+    )
+
+    response = await async_client.delete(f"/like/{created_post['id']}", headers=headers)
+
+    assert response.status_code == 204
+    assert not buffer.pending
+    assert await buffer.flush() == 0
+    assert await count_likes(created_post["id"]) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_unlike_flushed_like(
+    async_client: AsyncClient,
+    created_post: dict,
+    logged_in_token: str,
+    buffer: LikeBuffer,
+):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    await async_client.post(
+        "/like", json={"post_id": created_post["id"]}, headers=headers
+    )
+    await buffer.flush()
+
+    response = await async_client.delete(f"/like/{created_post['id']}", headers=headers)
+
+    assert response.status_code == 204
+    assert await count_likes(created_post["id"]) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_unlike_flushed_like_liked_again(
+    async_client: AsyncClient,
+    created_post: dict,
+    logged_in_token: str,
+    buffer: LikeBuffer,
+):
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    await async_client.post(
+        "/like", json={"post_id": created_post["id"]}, headers=headers
+    )
+    await buffer.flush()
+    await async_client.post(
+        "/like", json={"post_id": created_post["id"]}, headers=headers
+    )
+
+    response = await async_client.delete(f"/like/{created_post['id']}", headers=headers)
+
+    assert response.status_code == 204
+    assert not buffer.pending
+    assert await count_likes(created_post["id"]) == (0, 0)
+
+
+@pytest.mark.anyio
+async def test_like_rejected_when_buffer_is_full(
+    async_client: AsyncClient,
+    created_post: dict,
+    registered_user: dict,
+    logged_in_token: str,
+    buffer: LikeBuffer,
+):
+    buffer.max_pending = 1
+    buffer.add(created_post["id"] + 1, registered_user["id"])
+
+    response = await async_client.post(
+        "/like",
+        json={"post_id": created_post["id"]},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert buffer.rejected == 1
+    # a like already pending is no new entry, so it is still accepted
+    buffer.add(created_post["id"] + 1, registered_user["id"])
+    assert len(buffer.pending) == 1
+
+
+@pytest.mark.anyio
+async def test_shutdown_continues_when_final_flush_fails(mocker):
+    for name in (
+        "configure_logging",
+        "migrate",
+        "password_hash_pool",
+        "stop_log_queue",
+    ):
+        mocker.patch.object(main, name)
+    for name in ("database", "connect_replicas", "disconnect_replicas"):
+        mocker.patch.object(main, name, mocker.AsyncMock())
+    stop = mocker.patch.object(main.like_buffer, "stop", side_effect=OSError)
+
+    async with main.lifespan(main.app):
+        pass
+
+    stop.assert_awaited_once()
+    main.disconnect_replicas.assert_awaited_once()
+    main.database.disconnect.assert_awaited_once()
+    main.password_hash_pool.shutdown.assert_called_once()
+    main.stop_log_queue.assert_called_once()
@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+
+import pytest
+from asgi_correlation_id import CorrelationIdFilter
+from httpx import AsyncClient
+
+from src.configs import logging_config
+from src.configs.logging_config import (
+    EmailObfuscationFilter,
+    obfuscated,
+    start_log_queue,
+    stop_log_queue,
+)
+from src.tests.routers.test_post import create_post
+
+REQUESTS = 10
+
+
+class SlowHandler(logging.Handler):
+    # a sink that takes a while for every record, like a slow disk
+    def __init__(self, delay: float = 0.001) -> None:
+        super().__init__()
+        self.delay = delay
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        time.sleep(self.delay)
+        self.records.append(record)
+
+
+class BlockedHandler(logging.Handler):
+    # a sink stuck until released, like a log shipping service that hangs
+    def __init__(self, timeout: float = 5) -> None:
+        super().__init__()
+        self.unblocked = threading.Event()
+        self.timeout = timeout
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # the timeout only keeps a broken test from hanging
+        self.unblocked.wait(self.timeout)
+        self.records.append(record)
+
+
+@pytest.fixture()
+def src_logger():
+    logger = logging.getLogger("src")
+    handlers, level, propagate = logger.handlers, logger.level, logger.propagate
+    logger.setLevel("INFO")
+    logger.propagate = False
+    yield logger
+    stop_log_queue()
+    logger.handlers = handlers
+    logger.setLevel(level)
+    logger.propagate = propagate
+
+
+@pytest.mark.anyio
+async def test_blocked_sink_does_not_block_requests(
+    async_client: AsyncClient, logged_in_token: str, src_logger: logging.Logger
+):
+    post = await create_post("Test Post", async_client, logged_in_token)
+
+    sink = BlockedHandler()
+    src_logger.handlers = [sink]
+    start_log_queue(
+        ["src"], [CorrelationIdFilter(default_value="-")], maxsize=1000, block=False
+    )
+    try:
+        for _ in range(REQUESTS):
+            response = await async_client.get(f"/post/{post['id']}")
+            assert response.status_code == 200
+        # every request was answered before the sink wrote anything
+        assert sink.records == []
+    finally:
+        sink.unblocked.set()
+        stop_log_queue()
+
+    # every record is written once the queue is stopped
+    assert len(sink.records) >= REQUESTS
+    assert src_logger.handlers == [sink]
+    # the filter ran on the request's task, not on the listener thread
+    assert all(record.correlation_id != "-" for record in sink.records)
+
+
+def test_full_queue_drops(src_logger: logging.Logger):
+    sink = BlockedHandler()
+    src_logger.handlers = [sink]
+    start_log_queue(["src"], [], maxsize=1, block=False)
+
+    # the listener takes the first record, the second fills the queue
+    src_logger.info("first")
+    while logging_config.log_listener.queue.qsize():
+        time.sleep(0.001)
+    for message in ("second", "third", "fourth"):
+        src_logger.info(message)
+    assert logging_config.queue_handlers["src"].dropped == 2
+
+    sink.unblocked.set()
+    stop_log_queue()
+
+    # the warning goes straight to the sink, the queue is gone by then
+    assert [record.getMessage() for record in sink.records] == [
+        "first",
+        "second",
+        "Dropped 2 log records, the log queue was full",
+    ]
+
+
+def test_full_queue_blocks(src_logger: logging.Logger):
+    sink = SlowHandler()
+    src_logger.handlers = [sink]
+    start_log_queue(["src"], [], maxsize=1, block=True)
+
+    for number in range(20):
+        src_logger.info("record %d", number)
+    stop_log_queue()
+
+    assert [record.getMessage() for record in sink.records] == [
+        f"record {number}" for number in range(20)
+    ]
+
+
+@pytest.mark.parametrize(
+    "email, obfuscated_length, expected",
+    [
+        ("michal.goss@example.net", 2, "mi*********@example.net"),
+        ("michal.goss@example.net", 0, "***********@example.net"),
+        ("a@example.net", 2, "a@example.net"),
+        ("not-an-email", 2, "no**********"),
+        ("a@b@example.net", 0, "***@example.net"),
+        ("", 2, ""),
+    ],
+)
+def test_obfuscated(email: str, obfuscated_length: int, expected: str):
+    assert obfuscated(email, obfuscated_length) == expected
+
+
+def test_email_obfuscated_once_per_record():
+    email_filter = EmailObfuscationFilter(obfuscated_length=0)
+    record = logging.makeLogRecord({"email": "michal.goss@example.net"})
+    obfuscated.cache_clear()
+
+    # one pass per handler, as when the filter sits on every sink
+    for _ in range(3):
+        assert email_filter.filter(record)
+    assert record.email == "***********@example.net"
+    assert obfuscated.cache_info().misses == 1
+    assert obfuscated.cache_info().hits == 0
+
+    email_filter.filter(logging.makeLogRecord({"email": "michal.goss@example.net"}))
+    assert obfuscated.cache_info().hits == 1
+
+
+@pytest.mark.parametrize("email", [None, 42])
+def test_email_obfuscation_ignores_other_values(email):
+    record = logging.makeLogRecord({"email": email})
+
+    assert EmailObfuscationFilter().filter(record)
+    assert record.email == email
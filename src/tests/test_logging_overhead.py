@@ -0,0 +1,87 @@
+import io
+import logging
+from collections import Counter
+
+import pytest
+from httpx import AsyncClient
+
+from src.statements import BoundStatement
+from src.tests.routers.test_post import create_post
+
+
+class FormattingHandler(logging.Handler):
+    # formats every record like the console handler, so the cost of emitting counts
+    def __init__(self) -> None:
+        super().__init__()
+        self.setFormatter(logging.Formatter("%(name)s:%(lineno)d - %(message)s"))
+        self.stream = io.StringIO()
+        self.levels = Counter()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.levels[record.levelname] += 1
+        self.stream.write(self.format(record))
+
+
+@pytest.fixture()
+def src_logger():
+    logger = logging.getLogger("src")
+    level, propagate = logger.level, logger.propagate
+    logger.propagate = False
+    yield logger
+    logger.setLevel(level)
+    logger.propagate = propagate
+
+
+async def like_and_read(
+    async_client: AsyncClient, post_id: int, logged_in_token: str
+) -> None:
+    headers = {"Authorization": f"Bearer {logged_in_token}"}
+    # liking and unliking invalidate the cached post, so the reads query the database
+    await async_client.post("/like", json={"post_id": post_id}, headers=headers)
+    await async_client.get(f"/post/{post_id}")
+    await async_client.delete(f"/like/{post_id}", headers=headers)
+    await async_client.get(f"/post/{post_id}")
+
+
+@pytest.mark.anyio
+async def test_records_below_level_are_not_created(
+    async_client: AsyncClient, logged_in_token: str, src_logger: logging.Logger
+):
+    post = await create_post("Test Post", async_client, logged_in_token)
+
+    levels = {}
+    for level in ("CRITICAL", "INFO", "DEBUG"):
+        handler = FormattingHandler()
+        src_logger.addHandler(handler)
+        src_logger.setLevel(level)
+        try:
+            await like_and_read(async_client, post["id"], logged_in_token)
+        finally:
+            src_logger.removeHandler(handler)
+        levels[level] = handler.levels
+
+    # below the logger's level no record is created, let alone formatted
+    assert not levels["CRITICAL"]
+    assert levels["INFO"]["INFO"] and not levels["INFO"]["DEBUG"]
+    assert levels["DEBUG"]["DEBUG"]
+
+
+@pytest.mark.anyio
+async def test_disabled_debug_does_not_render_queries(
+    async_client: AsyncClient, logged_in_token: str, src_logger: logging.Logger, mocker
+):
+    post = await create_post("Test Post", async_client, logged_in_token)
+    render = mocker.spy(BoundStatement, "__str__")
+
+    src_logger.setLevel("INFO")
+    await async_client.get(f"/post/{post['id']}/comment")
+    assert render.call_count == 0
+
+    handler = FormattingHandler()
+    src_logger.addHandler(handler)
+    src_logger.setLevel("DEBUG")
+    try:
+        await async_client.get(f"/post/{post['id']}")
+    finally:
+        src_logger.removeHandler(handler)
+    assert render.call_count == 1
@@ -0,0 +1,87 @@
+import pytest
+from httpx import AsyncClient
+
+from src import metrics
+from src.metrics import Counter, Histogram, Registry
+from src.tests.routers.test_post import create_post
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.register(
+        Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    )
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/post")
+
+    assert registry.render().splitlines() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/post",le="0.1"} 2',
+        'latency_seconds_bucket{route="/post",le="1.0"} 3',
+        'latency_seconds_bucket{route="/post",le="+Inf"} 4',
+        'latency_seconds_sum{route="/post"} 3.65',
+        'latency_seconds_count{route="/post"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.register(Counter("hits_total", "Hits.", ("path",))).inc('a"b\\c\n')
+
+    assert 'hits_total{path="a\\"b\\\\c\\n"} 1' in registry.render()
+
+
+@pytest.mark.anyio
+async def test_request_metrics(async_client: AsyncClient, logged_in_token: str):
+    post = await create_post("Test Post", async_client, logged_in_token)
+    route = ("GET", "/post/{post_id}")
+    requests = metrics.requests_total.value(*route, "200")
+    queries = metrics.request_queries.sum(*route)
+
+    await async_client.get(f"/post/{post['id']}")
+    await async_client.get("/no-such-path")
+
+    assert metrics.requests_total.value(*route, "200") == requests + 1
+    assert metrics.requests_total.value("GET", "unmatched", "404") >= 1
+    # the post and its comments come from one query
+    assert metrics.request_queries.sum(*route) == queries + 1
+    assert metrics.requests_in_progress.value("GET") == 0
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint(async_client: AsyncClient, registered_user: dict):
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+    body = response.text
+    assert 'http_requests_total{method="POST",route="/register",status="201"}' in body
+    assert 'db_queries_total{operation="execute"}' in body
+    assert "password_hash_pool_in_flight 0" in body
+    assert "# TYPE password_hash_pool_rejected_total counter" in body
+
+
+def sample(body: str, name: str) -> float:
+    return next(
+        float(line.split()[1]) for line in body.splitlines() if line.startswith(name)
+    )
+
+
+@pytest.mark.anyio
+async def test_auth_cache_metrics(async_client: AsyncClient, logged_in_token: str):
+    body = (await async_client.get("/metrics")).text
+    hits = sample(body, "auth_user_cache_hits_total ")
+    misses = sample(body, "auth_user_cache_misses_total ")
+    token_hits = sample(body, "auth_token_cache_hits_total ")
+
+    # the first request looks the user up, the second finds it cached
+    for _ in range(2):
+        await create_post("Test Post", async_client, logged_in_token)
+
+    body = (await async_client.get("/metrics")).text
+    assert "# TYPE auth_user_cache_hits_total counter" in body
+    assert sample(body, "auth_user_cache_misses_total ") == misses + 1
+    assert sample(body, "auth_user_cache_hits_total ") == hits + 1
+    assert sample(body, "auth_token_cache_hits_total ") >= token_hits + 1
+    assert "auth_user_cache_evictions_total 0" in body
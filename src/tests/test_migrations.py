@@ -0,0 +1,85 @@
+import pytest
+import sqlalchemy
+
+from src import migrations
+
+
+@pytest.fixture()
+def old_database(tmp_path) -> sqlalchemy.Engine:
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        for statement in migrations.INITIAL_SCHEMA:
+            connection.execute(sqlalchemy.text(statement))
+        connection.execute(
+            sqlalchemy.text("INSERT INTO users VALUES (1, 'a@b.c', 'x')")
+        )
+        connection.execute(sqlalchemy.text("INSERT INTO posts VALUES (1, 'Post', 1)"))
+        # the same like twice, stored before likes were unique
+        connection.execute(
+            sqlalchemy.text("INSERT INTO likes VALUES (1, NULL, 1, 1), (2, NULL, 1, 1)")
+        )
+        connection.execute(
+            sqlalchemy.text("INSERT INTO comments VALUES (1, 'Comment', 1, 1)")
+        )
+    yield engine
+    engine.dispose()
+
+
+def test_migrate_existing_database(old_database: sqlalchemy.Engine):
+    assert migrations.migrate(old_database) == len(migrations.MIGRATIONS)
+
+    with old_database.connect() as connection:
+        post = connection.execute(sqlalchemy.text("SELECT * FROM posts")).one()
+        likes = connection.execute(sqlalchemy.text("SELECT id FROM likes")).all()
+        indexes = {
+            index["name"]
+            for index in sqlalchemy.inspect(connection).get_indexes("likes")
+        }
+
+    assert post.like_count == 1
+    assert post.comment_count == 1
+    assert likes == [(1,)]
+    assert {"ux_likes_post_id_user_id", "ix_likes_user_id"} <= indexes
+
+
+def test_migrate_is_idempotent(old_database: sqlalchemy.Engine):
+    version = migrations.migrate(old_database)
+    assert migrations.migrate(old_database) == version
+
+    with old_database.connect() as connection:
+        assert migrations.current_version(connection) == version
+
+
+def test_migrate_fresh_database(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    assert migrations.migrate(engine) == len(migrations.MIGRATIONS)
+
+    with engine.connect() as connection:
+        indexes = sqlalchemy.inspect(connection).get_indexes("comments")
+    assert "ix_comments_post_id_id" in {index["name"] for index in indexes}
+    engine.dispose()
+
+
+def test_migrate_indexes_existing_bodies(old_database: sqlalchemy.Engine):
+    migrations.migrate(old_database)
+
+    with old_database.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                "INSERT INTO posts (id, body, user_id) VALUES (2, 'New', 1)"
+            )
+        )
+        posts = connection.execute(
+            sqlalchemy.text(
+                "SELECT rowid FROM posts_fts WHERE posts_fts MATCH 'post OR new'"
+            )
+        ).all()
+        comments = connection.execute(
+            sqlalchemy.text(
+                "SELECT rowid FROM comments_fts WHERE comments_fts MATCH 'comment'"
+            )
+        ).all()
+
+    # written before and after the migration
+    assert sorted(posts) == [(1,), (2,)]
+    assert comments == [(1,)]
@@ -0,0 +1,96 @@
+import logging
+
+import pytest
+from asgi_correlation_id import CorrelationIdMiddleware
+from httpx import ASGITransport, AsyncClient
+
+from src.database import database
+from src.main import app
+from src.query_profiler import (
+    PROFILE_HEADER,
+    QueryProfile,
+    QueryProfilerMiddleware,
+    query_shape,
+)
+from src.routers.post import select_post
+from src.tests.routers.test_post import create_post
+
+
+def profile_summary(response) -> dict[str, str]:
+    return dict(
+        part.split("=") for part in response.headers[PROFILE_HEADER].split(", ")
+    )
+
+
+@pytest.fixture()
+async def profiled_client(client) -> AsyncClient:
+    profiled = CorrelationIdMiddleware(QueryProfilerMiddleware(app, repeat_threshold=2))
+    async with AsyncClient(
+        transport=ASGITransport(app=profiled), base_url=client.base_url
+    ) as ac:
+        yield ac
+
+
+def test_repeated_shapes():
+    profile = QueryProfile()
+    for post_id in (1, 2, 3):
+        profile.add(select_post(post_id=post_id), 0.001)
+    profile.add("SELECT   1", 0.001)
+
+    assert profile.repeated(threshold=3) == {query_shape(select_post(post_id=1)): 3}
+    assert profile.repeated(threshold=4) == {}
+    assert profile.queries[-1][0] == "SELECT 1"
+
+
+@pytest.mark.anyio
+async def test_create_comment_profile(
+    profiled_client: AsyncClient, logged_in_token: str, caplog
+):
+    post = await create_post("Test Post", profiled_client, logged_in_token)
+
+    with caplog.at_level(logging.INFO, logger="src.query_profiler"):
+        response = await profiled_client.post(
+            "/comment",
+            json={"body": "Test Comment", "post_id": post["id"]},
+            headers={"Authorization": f"Bearer {logged_in_token}"},
+        )
+
+    # find_post, the insert and the counter update, the user is cached
+    summary = profile_summary(response)
+    assert summary["queries"] == "3"
+    assert summary["repeated"] == "0"
+    (record,) = [r for r in caplog.records if r.name == "src.query_profiler"]
+    assert record.levelno == logging.INFO
+    assert record.query_count == 3
+    assert record.repeated_queries == []
+
+
+@pytest.mark.anyio
+async def test_repeated_queries_are_flagged(caplog):
+    async def one_query_per_post(scope, receive, send):
+        for post_id in (1, 2, 3):
+            await database.fetch_one(select_post(post_id=post_id))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    profiled = CorrelationIdMiddleware(QueryProfilerMiddleware(one_query_per_post))
+    transport = ASGITransport(app=profiled)
+    with caplog.at_level(logging.DEBUG, logger="src.query_profiler"):
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            response = await ac.get("/posts")
+
+    assert profile_summary(response)["repeated"] == "1"
+    summary = caplog.records[-1]
+    assert summary.levelno == logging.WARNING
+    assert summary.repeated_queries == [
+        {"sql": query_shape(select_post(post_id=1)), "count": 3}
+    ]
+    queries = [r for r in caplog.records if r.getMessage().startswith("Query took")]
+    assert len(queries) == 3
+
+
+@pytest.mark.anyio
+async def test_not_profiled_by_default(async_client: AsyncClient):
+    response = await async_client.get("/post")
+
+    assert PROFILE_HEADER not in response.headers
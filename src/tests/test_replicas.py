@@ -0,0 +1,81 @@
+import databases
+import pytest
+import sqlalchemy
+from httpx import AsyncClient
+
+from src import replicas
+from src.database import database, post_table, user_table
+from src.migrations import migrate
+
+
+async def create_replica(path, body: str) -> databases.Database:
+    url = f"sqlite:///{path}"
+    engine = sqlalchemy.create_engine(url)
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            user_table.insert().values(id=1, email="test@example.net", password="x")
+        )
+        connection.execute(post_table.insert().values(id=1, body=body, user_id=1))
+    engine.dispose()
+
+    replica = databases.Database(url)
+    await replica.connect()
+    return replica
+
+
+@pytest.fixture()
+async def replica(tmp_path, mocker):
+    replica = await create_replica(tmp_path / "replica.db", "Replica post")
+    mocker.patch.object(replicas, "replicas", [replica])
+    yield replica
+    await replica.disconnect()
+
+
+@pytest.mark.anyio
+async def test_get_reads_from_replica(async_client: AsyncClient, replica):
+    response = await async_client.get("/post")
+
+    assert [post["body"] for post in response.json()] == ["Replica post"]
+
+
+@pytest.mark.anyio
+async def test_read_your_writes(
+    async_client: AsyncClient, replica, logged_in_token: str
+):
+    response = await async_client.post(
+        "/post",
+        json={"body": "Primary post"},
+        headers={"Authorization": f"Bearer {logged_in_token}"},
+    )
+    assert "read_primary" in response.cookies
+
+    # the client that wrote reads the primary while the cookie lasts
+    response = await async_client.get("/post")
+    assert [post["body"] for post in response.json()] == ["Primary post"]
+
+    async_client.cookies.clear()
+    response = await async_client.get("/post")
+    assert [post["body"] for post in response.json()] == ["Replica post"]
+
+
+@pytest.mark.anyio
+async def test_read_database_round_robin(tmp_path, mocker):
+    first = await create_replica(tmp_path / "first.db", "First")
+    second = await create_replica(tmp_path / "second.db", "Second")
+    mocker.patch.object(replicas, "replicas", [first, second])
+    try:
+        used = {replicas.read_database() for _ in range(4)}
+        assert used == {first, second}
+
+        token = replicas.use_primary.set(True)
+        assert replicas.read_database() is database
+        replicas.use_primary.reset(token)
+    finally:
+        await first.disconnect()
+        await second.disconnect()
+
+
+def test_read_database_without_replicas():
+    assert replicas.replicas == []
+    assert replicas.read_database() is database
@@ -0,0 +1,140 @@
+import json
+
+import orjson
+import pytest
+from httpx import AsyncClient
+
+from src.models.post import Comment, UserPostWithComments
+from src.response_cache import (
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    ResponseCache,
+    serialize,
+    serialize_rows,
+)
+from src.routers import post
+from src.tests.routers.test_post import create_comment, create_post, like_post
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+
+@pytest.mark.anyio
+async def test_feed_etag_not_modified(async_client: AsyncClient, created_post: dict):
+    response = await async_client.get("/post")
+    etag = response.headers["ETag"]
+
+    response = await async_client.get("/post", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+@pytest.mark.anyio
+async def test_feed_served_from_cache(
+    async_client: AsyncClient, created_post: dict, mocker
+):
+    first = await async_client.get("/post")
+    fetch_all = mocker.patch("src.routers.post.database.fetch_all")
+
+    second = await async_client.get("/post")
+    fetch_all.assert_not_called()
+    assert second.json() == first.json()
+
+
+@pytest.mark.anyio
+async def test_writes_invalidate_cached_reads(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    post_id = created_post["id"]
+    feed_etag = (await async_client.get("/post")).headers["ETag"]
+    await async_client.get(f"/post/{post_id}")
+    await async_client.get(f"/post/{post_id}/comment")
+
+    await like_post(post_id, async_client, logged_in_token)
+    response = await async_client.get("/post", headers={"If-None-Match": feed_etag})
+    assert response.status_code == 200
+    assert response.json()[0]["likes"] == 1
+    assert (await async_client.get(f"/post/{post_id}")).json()["post"]["likes"] == 1
+
+    comment = await create_comment("Comment", post_id, async_client, logged_in_token)
+    assert (await async_client.get(f"/post/{post_id}/comment")).json() == [comment]
+    assert (await async_client.get(f"/post/{post_id}")).json()["comments"] == [comment]
+
+    second = await create_post("Second Post", async_client, logged_in_token)
+    assert (await async_client.get("/post")).json()[0]["id"] == second["id"]
+
+
+@pytest.mark.anyio
+async def test_memory_backend_versions_are_bounded():
+    backend = MemoryCacheBackend(maxsize=10, max_versions=2)
+    versions = [await backend.incr("version:post:1") for _ in range(2)]
+    for tag in ("post:2", "post:3"):
+        await backend.incr(f"version:{tag}")
+
+    assert list(backend.counters) == ["version:post:2", "version:post:3"]
+    # the last version is still current, the next one is new
+    assert await backend.counter("version:post:1") == versions[-1]
+    assert await backend.incr("version:post:1") not in versions
+    # read recently, so not the one evicted
+    await backend.counter("version:post:3")
+    await backend.incr("version:post:4")
+    assert list(backend.counters) == ["version:post:3", "version:post:4"]
+
+
+@pytest.mark.anyio
+async def test_redis_backend(async_client: AsyncClient, created_post: dict, mocker):
+    redis = FakeRedis()
+    mocker.patch(
+        "src.routers.post.response_cache",
+        ResponseCache(RedisCacheBackend(redis), ttl=60),
+    )
+
+    first = await async_client.get("/post")
+    assert "mediaapp:feed:new:20:None:None@0" in redis.data
+
+    fetch_all = mocker.patch("src.routers.post.database.fetch_all")
+    second = await async_client.get("/post")
+    fetch_all.assert_not_called()
+    assert second.json() == first.json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+
+@pytest.mark.anyio
+async def test_serialize_rows_matches_validated_output(
+    async_client: AsyncClient, created_post: dict, logged_in_token: str
+):
+    await create_comment(
+        "Test Comment", created_post["id"], async_client, logged_in_token
+    )
+    await like_post(created_post["id"], async_client, logged_in_token)
+
+    loaded = [
+        (post.Feed, await post.load_posts(post.PostSorting.new, 20, None, None)),
+        (post.Feed, await post.load_posts(post.PostSorting.new, 20, None, 2)),
+        (list[Comment], await post.load_comments(created_post["id"])),
+        (
+            UserPostWithComments,
+            await post.load_post_with_comments(created_post["id"], None),
+        ),
+    ]
+    for response_type, (content, _) in loaded:
+        fast = json.loads(serialize_rows(response_type, content))
+        assert fast == json.loads(serialize(response_type, content))
+
+
+def test_serialize_rows_rejects_other_objects():
+    with pytest.raises(orjson.JSONEncodeError):
+        serialize_rows(list, [object()])
@@ -178,3 +178,77 @@ async def test_get_current_user_wrong_type_token(registered_user: dict):
     token = security.create_confirmation_token(registered_user["email"])
     with pytest.raises(security.HTTPException):
         await security.get_current_user(token)
+
+
+@pytest.mark.anyio
+async def test_get_current_user_cached(registered_user: dict, mocker):
+    token = security.create_access_token(registered_user["email"])
+    await security.get_current_user(token)
+
+    get_user = mocker.patch("src.security.get_user")
+    user = await security.get_current_user(token)
+
+    get_user.assert_not_called()
+    assert user.email == registered_user["email"]
+
+
+@pytest.mark.anyio
+async def test_invalidate_user(registered_user: dict, mocker):
+    token = security.create_access_token(registered_user["email"])
+    await security.get_current_user(token)
+    security.invalidate_user(registered_user["email"])
+
+    get_user = mocker.spy(security, "get_user")
+    await security.get_current_user(token)
+
+    get_user.assert_called_once_with(email=registered_user["email"])
+
+
+@pytest.mark.anyio
+async def test_password_hash_async():
+    hashed = await security.get_password_hash_async("password")
+    assert await security.verify_password_async("password", hashed)
+    assert not await security.verify_password_async("wrongpassword", hashed)
+
+
+@pytest.mark.anyio
+async def test_password_hash_pool_saturated(mocker):
+    pool = security.PasswordHashPool(workers=1, max_queue=0)
+    mocker.patch.object(pool, "in_flight", 1)
+
+    with pytest.raises(security.HTTPException) as exc_info:
+        await pool.run(security.get_password_hash, "password")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "1"}
+    assert pool.rejected == 1
+
+
+def test_get_subject_for_token_type_cached(mocker):
+    email = "test@example.com"
+    token = security.create_access_token(email)
+    security.get_subject_for_token_type(token, type="access")
+
+    decode = mocker.spy(security.jwt, "decode")
+    assert email == security.get_subject_for_token_type(token, type="access")
+    decode.assert_not_called()
+    # the cached claims are still checked against the expected type
+    with pytest.raises(security.HTTPException):
+        security.get_subject_for_token_type(token, type="confirmation")
+
+
+def test_get_subject_for_token_type_cached_until_expiry(mocker):
+    token = security.create_access_token("test@example.com")
+    exp = jwt.get_unverified_claims(token)["exp"]
+    security.get_subject_for_token_type(token, type="access")
+
+    mocker.patch.object(security.token_cache, "clock", return_value=exp + 0.5)
+    decode = mocker.patch(
+        "src.security.jwt.decode", side_effect=security.ExpiredSignatureError
+    )
+    security.get_subject_for_token_type(token, type="access")
+    decode.assert_not_called()
+
+    security.token_cache.clock.return_value = exp + 1
+    with pytest.raises(security.HTTPException) as exc_info:
+        security.get_subject_for_token_type(token, type="access")
+    assert "Token has expired" == exc_info.value.detail
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+import sqlalchemy
+
+from src.database import post_table, user_table
+from src.migrations import migrate
+from src.models.post import CommentIn
+from src.models.user import User
+from src.routers import post as post_router
+from src.sqlite_pool import PooledSQLiteDatabase, SQLiteDatabase, production_pragmas
+
+
+def migrated_url(tmp_path) -> str:
+    url = f"sqlite:///{tmp_path / 'pooled.db'}"
+    engine = sqlalchemy.create_engine(url)
+    migrate(engine)
+    engine.dispose()
+    return url
+
+
+def pooled(url: str) -> PooledSQLiteDatabase:
+    return PooledSQLiteDatabase(
+        url,
+        readers=2,
+        pragmas=production_pragmas(
+            mmap_size=1024 * 1024, cache_size=-1024, busy_timeout=1000
+        ),
+    )
+
+
+async def connected(database):
+    await database.connect()
+    await database.execute(
+        user_table.insert().values(id=1, email="test@example.net", password="x")
+    )
+    await database.execute(post_table.insert().values(id=1, body="Post", user_id=1))
+    return database
+
+
+@pytest.fixture()
+async def pooled_database(tmp_path):
+    database = await connected(pooled(migrated_url(tmp_path)))
+    yield database
+    await database.disconnect()
+
+
+@pytest.fixture(params=["stock", "pooled"])
+async def sqlite_database(request, tmp_path):
+    url = migrated_url(tmp_path)
+    database = await connected(
+        SQLiteDatabase(url) if request.param == "stock" else pooled(url)
+    )
+    yield database
+    await database.disconnect()
+
+
+def select_like_count():
+    return sqlalchemy.select(post_table.c.like_count).where(post_table.c.id == 1)
+
+
+@pytest.mark.anyio
+async def test_pragmas_applied(pooled_database: PooledSQLiteDatabase):
+    pool = pooled_database._backend._pool
+    async with pool.reader() as reader:
+        for connection in (pool.writer, reader):
+            async with connection.execute("PRAGMA journal_mode") as cursor:
+                assert (await cursor.fetchone())[0] == "wal"
+            async with connection.execute("PRAGMA synchronous") as cursor:
+                assert (await cursor.fetchone())[0] == 1  # NORMAL
+            async with connection.execute("PRAGMA busy_timeout") as cursor:
+                assert (await cursor.fetchone())[0] == 1000
+        async with reader.execute("PRAGMA query_only") as cursor:
+            assert (await cursor.fetchone())[0] == 1
+
+
+@pytest.mark.anyio
+async def test_reads_not_blocked_by_write_transaction(
+    pooled_database: PooledSQLiteDatabase,
+):
+    written = asyncio.Event()
+    read = asyncio.Event()
+
+    async def write():
+        async with pooled_database.transaction():
+            await pooled_database.execute(
+                post_table.update().values(like_count=post_table.c.like_count + 1)
+            )
+            written.set()
+            await read.wait()
+
+    writer = asyncio.create_task(write())
+    await written.wait()
+    # the reader sees the last committed state while the writer is mid-transaction
+    assert await pooled_database.fetch_val(select_like_count()) == 0
+    read.set()
+    await writer
+
+    assert await pooled_database.fetch_val(select_like_count()) == 1
+
+
+@pytest.mark.anyio
+async def test_transactions_are_serialized(pooled_database: PooledSQLiteDatabase):
+    async def increment():
+        async with pooled_database.transaction():
+            likes = await pooled_database.fetch_val(select_like_count())
+            await asyncio.sleep(0)
+            await pooled_database.execute(
+                post_table.update().values(like_count=likes + 1)
+            )
+
+    await asyncio.gather(*(increment() for _ in range(20)))
+
+    assert await pooled_database.fetch_val(select_like_count()) == 20
+
+
+@pytest.mark.anyio
+async def test_rollback_releases_writer(pooled_database: PooledSQLiteDatabase):
+    with pytest.raises(RuntimeError):
+        async with pooled_database.transaction():
+            await pooled_database.execute(post_table.update().values(like_count=5))
+            raise RuntimeError
+
+    await pooled_database.execute(post_table.update().values(like_count=1))
+    assert await pooled_database.fetch_val(select_like_count()) == 1
+
+
+@pytest.mark.anyio
+async def test_readers_are_reused(pooled_database: PooledSQLiteDatabase):
+    async def read():
+        return await pooled_database.fetch_val(select_like_count())
+
+    assert await asyncio.gather(*(read() for _ in range(20))) == [0] * 20
+
+    # the writer and at most two readers
+    assert len(pooled_database._backend._pool.opened) <= 3
+
+
+@pytest.mark.anyio
+async def test_iterate_streams_from_reader(pooled_database: PooledSQLiteDatabase):
+    async for post in pooled_database.iterate(post_table.select()):
+        # the writer is free while the rows are read
+        await asyncio.wait_for(
+            pooled_database.execute(
+                post_table.update().values(like_count=post_table.c.like_count + 1)
+            ),
+            timeout=1,
+        )
+        assert post.id == 1
+    assert await pooled_database.fetch_val(select_like_count()) == 1
+
+
+@pytest.mark.anyio
+async def test_concurrent_comment_writes(sqlite_database, monkeypatch):
+    # each comment is an insert and a counter update in one transaction, and the
+    # insert fires the full-text index trigger
+    monkeypatch.setattr(post_router, "database", sqlite_database)
+    user = User(id=1, email="test@example.net")
+
+    await asyncio.gather(
+        *(
+            post_router.create_comment(CommentIn(body=f"Comment {i}", post_id=1), user)
+            for i in range(16)
+        )
+    )
+
+    comments = sqlalchemy.select(post_table.c.comment_count).where(post_table.c.id == 1)
+    assert await sqlite_database.fetch_val(comments) == 16
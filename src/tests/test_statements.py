@@ -0,0 +1,45 @@
+import pytest
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.database import database, user_table
+from src.statements import CachedStatement
+
+
+@pytest.fixture()
+def select_user() -> CachedStatement:
+    return CachedStatement(
+        user_table.select().where(user_table.c.email == sqlalchemy.bindparam("email"))
+    )
+
+
+def test_compiled_once_per_dialect(select_user: CachedStatement):
+    first = select_user(email="a@example.net").compile(sqlite.dialect())
+    second = select_user(email="b@example.net").compile(sqlite.dialect())
+    select_user(email="c@example.net").compile(postgresql.dialect())
+
+    assert first.string == second.string
+    assert first.params == {"email": "a@example.net"}
+    assert second.params == {"email": "b@example.net"}
+    assert select_user.compilations == 2
+
+
+def test_str_is_the_sql(select_user: CachedStatement):
+    assert str(select_user(email="a@example.net")) == str(select_user.query)
+
+
+def test_missing_value(select_user: CachedStatement):
+    with pytest.raises(sqlalchemy.exc.InvalidRequestError):
+        select_user().compile(sqlite.dialect()).construct_params()
+
+
+@pytest.mark.anyio
+async def test_executes_with_each_calls_values(
+    select_user: CachedStatement, registered_user: dict
+):
+    found = await database.fetch_one(select_user(email=registered_user["email"]))
+    missing = await database.fetch_one(select_user(email="other@example.net"))
+
+    assert found.id == registered_user["id"]
+    assert missing is None
+    assert select_user.compilations == 1